@@ -1,11 +1,20 @@
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Compiled once and shared by every fix_file call
+_RE3 = re.compile(r'([a-zA-Z0-9_\[\]]+) \| ([a-zA-Z0-9_\[\]]+) \| ([a-zA-Z0-9_\[\]]+)')
+_RE2 = re.compile(r'([a-zA-Z0-9_\[\]]+) \| ([a-zA-Z0-9_\[\]]+)')
 
 def fix_file(path):
     print(f"Fixing {path}")
     try:
         with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
+
+        # Nothing to rewrite: skip the write-back entirely
+        if ' | ' not in content:
+            return
         
         # Replace | with , inside type hints (simplified)
         # This is a bit risky but we're targeting a specific library's style
@@ -25,8 +34,8 @@ def fix_file(path):
             # Best: replace ' | ' with '' (just take the first type) or use strings.
             
             # Let's try to replace 'Type1 | Type2' with 'Union[Type1, Type2]'
-            content = re.sub(r'([a-zA-Z0-9_\[\]]+) \| ([a-zA-Z0-9_\[\]]+) \| ([a-zA-Z0-9_\[\]]+)', r'Union[\1, \2, \3]', content)
-            content = re.sub(r'([a-zA-Z0-9_\[\]]+) \| ([a-zA-Z0-9_\[\]]+)', r'Union[\1, \2]', content)
+            content = _RE3.sub(r'Union[\1, \2, \3]', content)
+            content = _RE2.sub(r'Union[\1, \2]', content)
             
             if 'from typing import' in content:
                 if 'Union' not in content:
@@ -41,9 +50,14 @@ def fix_file(path):
 
 base_dir = r'C:\Users\surya_prakash\AppData\Roaming\Python\Python39\site-packages\BinaryOptionsToolsV2'
 if os.path.exists(base_dir):
-    for root, dirs, files in os.walk(base_dir):
-        for f in files:
-            if f.endswith('.py'):
-                fix_file(os.path.join(root, f))
+    paths = [
+        os.path.join(root, f)
+        for root, dirs, files in os.walk(base_dir)
+        for f in files
+        if f.endswith('.py')
+    ]
+    # Each rewrite is blocking file I/O, so fan them out over threads
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) as ex:
+        list(ex.map(fix_file, paths))
 else:
     print(f"Directory not found: {base_dir}")
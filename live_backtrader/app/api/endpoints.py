@@ -1,8 +1,14 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import asyncio
+import hashlib
 import json
+import orjson
+import re
+from collections import deque
+from cachetools import TTLCache
 from app.data.pocketoption_history import PocketOptionHistory
 from app.engine.backtester import Backtester
 from app.core.config import settings
@@ -14,24 +20,136 @@ from app.data.websocket_stream import manager as ws_manager
 router = APIRouter()
 
 # Global History Fetcher (lazy init)
-from app.core.database import SessionLocal, UserConfig, init_db
-from sqlalchemy.orm import Session
+from app.core.database import SessionLocal, UserConfig, init_db, get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 
 # Init DB
-init_db()
-
-# DB Helper
-def get_db_session():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@router.on_event("startup")
+async def on_startup():
+    await init_db()
+    # Load the persisted SSID once; afterwards reads are served from session_manager
+    async with SessionLocal() as db:
+        config_item = await db.scalar(select(UserConfig).where(UserConfig.key == "ssid"))
+        if config_item and config_item.value:
+            session_manager.set_ssid(config_item.value, source="db")
 
 # Global History Fetcher (lazy init)
 history_fetcher = PocketOptionHistory()
 
+async def _disconnect(client):
+    try:
+        await client.disconnect()
+    except: pass
+
+_disconnect_tasks = set() # Strong refs so scheduled disconnects aren't GC'd mid-flight
+
+def _disconnect_later(client):
+    # Called from synchronous cache eviction; the cache is only used on the server loop
+    try:
+        task = asyncio.get_running_loop().create_task(_disconnect(client))
+    except RuntimeError:
+        return # No running loop (interpreter shutdown): nothing left to schedule on
+    _disconnect_tasks.add(task)
+    task.add_done_callback(_disconnect_tasks.discard)
+
+class _ClientCache(TTLCache):
+    """TTLCache that disconnects the broker clients it evicts (TTL expiry or size overflow)."""
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for _, client in expired:
+            _disconnect_later(client)
+        return expired
+
+    def popitem(self):
+        key, client = super().popitem()
+        _disconnect_later(client)
+        return key, client
+
+# Warm PocketOptionAsync clients keyed by SSID hash (skips the WS handshake on repeat checks)
+_client_cache = _ClientCache(maxsize=16, ttl=600)
+_client_pending = {} # SSID hash -> in-flight client construction, so each SSID builds only one client
+
+def _ssid_key(ssid: str) -> str:
+    return hashlib.sha256(ssid.encode("utf-8")).hexdigest()
+
+async def _build_po_client(key: str, ssid: str):
+    from BinaryOptionsToolsV2.pocketoption import PocketOptionAsync
+
+    # Initialize Client (in thread to avoid blocking)
+    loop = asyncio.get_running_loop()
+    client = await loop.run_in_executor(None, lambda: PocketOptionAsync(ssid))
+    # No blind handshake wait: callers poll balance() from t=0 with backoff
+    _client_cache[key] = client
+    return client
+
+async def get_po_client(ssid: str):
+    key = _ssid_key(ssid)
+    _client_cache.expire() # Disconnect clients past their TTL now, not at the next insert
+    client = _client_cache.get(key)
+    if client is not None:
+        return client
+    task = _client_pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_build_po_client(key, ssid))
+        _client_pending[key] = task
+        task.add_done_callback(lambda _: _client_pending.pop(key, None))
+    # Shielded: one caller giving up doesn't cancel the build the others are waiting on
+    return await asyncio.shield(task)
+
+# Backoff between SSID validation polls (~10.5s worst case)
+SSID_CHECK_DELAYS = [0.5, 1, 1, 2, 2, 4]
+# Exact phrases the broker library uses when it rejects a session or an SSID payload;
+# a bare "auth" would also match unrelated errors (proxy auth, "author", TLS client auth)
+AUTH_ERROR_PHRASES = ("authentication rejected", "notauthorized", "not authorized", "unauthorized",
+                      "ssid must", "invalid ssid")
+AUTH_STATUS_RE = re.compile(r"\b(?:401|403)\b")
+
+def _is_auth_error(e: Exception) -> bool:
+    # The broker library has no dedicated auth exception, so match on the message
+    message = str(e).lower()
+    return any(phrase in message for phrase in AUTH_ERROR_PHRASES) or AUTH_STATUS_RE.search(message) is not None
+
+# Last known balance per SSID hash, short enough to stay fresh for the dashboard
+_bal_cache = TTLCache(maxsize=4, ttl=3)
+_bal_pending = {} # SSID hash -> in-flight balance query shared by concurrent polls (removed when done)
+
+async def drop_po_client(ssid: str):
+    client = _client_cache.pop(_ssid_key(ssid), None)
+    if client:
+        await _disconnect(client)
+
+async def clear_cache():
+    _client_cache.expire() # Expired entries are disconnected by the cache itself
+    clients = list(_client_cache.values())
+    _client_cache.clear()
+    for client in clients:
+        await _disconnect(client)
+
+async def send_json_fast(websocket: WebSocket, payload: dict):
+    # orjson is much faster than json.dumps for float-heavy candle payloads;
+    # sent as a text frame so browsers can keep using JSON.parse(event.data)
+    await websocket.send_text(orjson.dumps(payload).decode("utf-8"))
+
+STREAM_CHUNK_ROWS = 256
+
+def stream_json_rows(key: str, rows: list, extra: Optional[dict] = None) -> StreamingResponse:
+    """
+    Stream {**extra, key: rows} as JSON, serializing rows in chunks with orjson
+    instead of materializing the whole encoded body at once.
+    """
+    async def gen():
+        head = orjson.dumps(extra or {})[:-1]
+        yield head + (b"," if extra else b"") + orjson.dumps(key) + b":["
+        for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+            chunk = b",".join(orjson.dumps(row) for row in rows[start:start + STREAM_CHUNK_ROWS])
+            yield (b"," if start else b"") + chunk
+        yield b"]}"
+
+    return StreamingResponse(gen(), media_type="application/json")
+
 class CandleRequest(BaseModel):
     asset: str
     period: int
@@ -50,34 +168,30 @@ class SSIDRequest(BaseModel):
 async def get_candles(asset: str, period: int, count: int = 100):
     try:
         candles = await history_fetcher.fetch_candles(asset, period, count)
-        return {"candles": candles}
+        return stream_json_rows("candles", candles)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/account/ssid")
-async def update_ssid(req: SSIDRequest, db: Session = Depends(get_db_session)):
+async def update_ssid(req: SSIDRequest, db: AsyncSession = Depends(get_db)):
     if not req.ssid or len(req.ssid) < 10:
         raise HTTPException(status_code=400, detail="Invalid SSID format")
     
-    from BinaryOptionsToolsV2.pocketoption import PocketOptionAsync
-    
-    client = None
+    # A different SSID invalidates every warm client
+    if req.ssid != session_manager.get_ssid():
+        await clear_cache()
+
     try:
-        # 1. Initialize Client (in thread to avoid blocking)
-        loop = asyncio.get_event_loop()
-        client = await loop.run_in_executor(None, lambda: PocketOptionAsync(req.ssid))
-        
-        # 2. Wait for Websocket Handshake
-        # The library usually needs a few seconds to authenticate
-        await asyncio.sleep(4) 
+        # 1. Get (or create and warm up) the client for this SSID
+        client = await get_po_client(req.ssid)
         
-        # 3. Verify Balance with Retries (Wait for Sync)
+        # 2. Verify Balance with Retries (Wait for Sync)
         balance = -1.0
         valid_connection = False
         
-        # Increase retries to ensure we wait long enough for initial sync
-        # Total wait potential: 10 * 3 = 30 seconds
-        for i in range(10):
+        # Exponential backoff while the connection syncs; bail out at once on auth failures
+        attempts = len(SSID_CHECK_DELAYS)
+        for i, delay in enumerate(SSID_CHECK_DELAYS):
              try:
                  bal_check = await client.balance()
                  
@@ -87,28 +201,30 @@ async def update_ssid(req: SSIDRequest, db: Session = Depends(get_db_session)):
                      valid_connection = True
                      break
                  
-                 print(f"SSID Check {i+1}/10: Balance unavailable/invalid ({bal_check}). Waiting...")
+                 print(f"SSID Check {i+1}/{attempts}: Balance unavailable/invalid ({bal_check}). Waiting...")
              except Exception as inner_e:
-                 print(f"SSID Check {i+1}/10 Error: {inner_e}")
+                 if _is_auth_error(inner_e):
+                     raise ValueError(f"SSID rejected by broker: {inner_e}")
+                 print(f"SSID Check {i+1}/{attempts} Error: {inner_e}")
              
-             await asyncio.sleep(3)
+             await asyncio.sleep(delay)
         
         if not valid_connection:
             raise ValueError("Could not connect or retrieve valid balance. Check SSID validity.")
         
-        # 4. Save to Database
-        config_item = db.query(UserConfig).filter(UserConfig.key == "ssid").first()
+        # 3. Save to Database
+        config_item = await db.scalar(select(UserConfig).where(UserConfig.key == "ssid"))
         if not config_item:
             config_item = UserConfig(key="ssid", value=req.ssid)
             db.add(config_item)
         else:
             config_item.value = req.ssid
-        db.commit()
+        await db.commit()
         
-        # 5. Update Runtime Session
+        # 4. Update Runtime Session
         session_manager.set_ssid(req.ssid)
         
-        # 6. Reset History Fetcher to force using new credentials
+        # 5. Reset History Fetcher to force using new credentials
         if history_fetcher.api:
             try:
                 await history_fetcher.close()
@@ -124,18 +240,13 @@ async def update_ssid(req: SSIDRequest, db: Session = Depends(get_db_session)):
 
     except Exception as e:
         print(f"SSID Update Failed: {e}")
+        await drop_po_client(req.ssid)
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        if client:
-            try:
-                await client.disconnect()
-            except: pass
 
 @router.get("/account/ssid")
-async def get_ssid_status(db: Session = Depends(get_db_session)):
+async def get_ssid_status():
     try:
-        config_item = db.query(UserConfig).filter(UserConfig.key == "ssid").first()
-        ssid = config_item.value if config_item else None
+        ssid = session_manager.get_ssid() or None
         
         balance = None
         # Optional: Try to get cached balance from session/fetcher if connected
@@ -148,26 +259,21 @@ async def get_ssid_status(db: Session = Depends(get_db_session)):
     except Exception as e:
         return {"configured": False, "error": str(e)}
 
-@router.get("/account/balance")
-async def get_balance():
+async def _query_balance(key: str, ssid: str):
     # Ensure connected
-    if not history_fetcher.api:
-        try:
-            await history_fetcher.connect()
-            # Give it a moment to stabilize if it was just connected
-            await asyncio.sleep(2)
-        except Exception as e:
-            # If we can't connect, it's likely an SSID issue or network
-            raise HTTPException(status_code=400, detail=f"Connection failed: {str(e)}")
+    try:
+        client = await get_po_client(ssid)
+    except Exception as e:
+        # If we can't connect, it's likely an SSID issue or network
+        raise HTTPException(status_code=400, detail=f"Connection failed: {str(e)}")
 
     try:
         # Retry logic for balance (Robust)
-        import asyncio
         balance = -1.0
         # Increased to 10 retries with 2s wait = ~20s max wait
         for i in range(10):
              try:
-                 balance = await history_fetcher.api.balance()
+                 balance = await client.balance()
                  if isinstance(balance, (int, float)) and balance >= 0:
                      break
                  # If -1, wait and retry
@@ -178,14 +284,36 @@ async def get_balance():
         # If still -1, it might be a temporary hiccup or truly offline
         if balance < 0:
              # Try one last deep reconnect
-             await history_fetcher.api.reconnect()
+             await client.reconnect()
              await asyncio.sleep(3)
-             balance = await history_fetcher.api.balance()
+             balance = await client.balance()
 
-        return {"balance": balance}
+        if isinstance(balance, (int, float)) and balance >= 0:
+            _bal_cache[key] = balance
+        return balance
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch balance: {str(e)}")
 
+@router.get("/account/balance")
+async def get_balance():
+    ssid = session_manager.get_ssid()
+    if not ssid:
+        raise HTTPException(status_code=400, detail="Connection failed: No SSID found. Please set SSID in Account settings.")
+
+    # Serve hot dashboard polls from the short-lived cache
+    key = _ssid_key(ssid)
+    if key in _bal_cache:
+        return {"balance": _bal_cache[key]}
+
+    # Coalesce concurrent polls: they all await one in-flight query instead of queueing on a lock
+    task = _bal_pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_query_balance(key, ssid))
+        _bal_pending[key] = task
+        task.add_done_callback(lambda _: _bal_pending.pop(key, None))
+    # Shielded: a poll that disconnects doesn't cancel the query the others are waiting on
+    return {"balance": await asyncio.shield(task)}
+
 @router.post("/backtest")
 async def run_backtest(req: BacktestRequest):
     # 1. Fetch Data
@@ -195,14 +323,15 @@ async def run_backtest(req: BacktestRequest):
         raise HTTPException(status_code=404, detail="No data found for asset")
     
     # 2. Run Backtest
-    # Run in threadpool to avoid blocking async loop
-    import asyncio
-    loop = asyncio.get_event_loop()
-    
+    # Run in a worker process so the sim/plotting doesn't hold the GIL against live streams
     tester = Backtester(data, req.code, req.params)
-    result = await loop.run_in_executor(None, tester.run)
+    result = await tester.run_async()
     
-    return result
+    # Error results carry no trade rows; stream the rest around the trades list
+    if "trades" not in result:
+        return result
+    trades = result.pop("trades")
+    return stream_json_rows("trades", trades, extra=result)
 
 @router.get("/assets")
 def get_assets():
@@ -236,7 +365,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: int):
                     
                     ssid = session_manager.get_ssid()
                     if not ssid:
-                        await websocket.send_json({"type": "error", "message": "No SSID configured"})
+                        await send_json_fast(websocket, {"type": "error", "message": "No SSID configured"})
                         continue
 
                     async def stream_chipa_data():
@@ -266,65 +395,71 @@ async def websocket_endpoint(websocket: WebSocket, client_id: int):
                         
                         # 1. Send simulated history first (so chart looks alive immediately)
                         # In production this comes from history_fetcher.fetch_candles
-                        history_candles = []
+                        # Bounded ring buffer: O(1) append with automatic eviction of the oldest candle
+                        history_candles = deque(maxlen=100)
                         import random
-                        from datetime import datetime, timedelta
-                        now = datetime.now()
-                        price = 1.0500
-                        for i in range(50):
-                            t = int((now - timedelta(minutes=50-i)).timestamp())
-                            price = price + (random.random() - 0.5) * 0.0010
-                            history_candles.append({
+                        import numpy as np
+                        from datetime import datetime
+                        # Generate the whole seed in a few vectorized ops: 1-minute bars ending now
+                        base = int(datetime.now().timestamp()) - 50 * 60
+                        times = base + np.arange(50) * 60
+                        opens = 1.0500 + np.cumsum((np.random.random(50) - 0.5) * 0.0010)
+                        closes = opens + (np.random.random(50) - 0.5) * 0.0005
+                        history_candles.extend(
+                            {
                                 "time": t,
-                                "open": price,
-                                "high": price + 0.0002,
-                                "low": price - 0.0002,
-                                "close": price + (random.random() - 0.5) * 0.0005,
+                                "open": o,
+                                "high": o + 0.0002,
+                                "low": o - 0.0002,
+                                "close": c,
                                 "asset": asset_name
-                            })
+                            }
+                            for t, o, c in zip(times.tolist(), opens.tolist(), closes.tolist())
+                        )
                             
                         try:
                              print("Sending history...")
-                             await websocket.send_json({
+                             await send_json_fast(websocket, {
                                  "type": "history",
-                                 "data": history_candles
+                                 "data": list(history_candles)
                              })
                         except Exception as e:
                              print(f"Failed to send history: {e}")
                              return
 
                         # 2. Start Live Stream
-                        while True:
-                            await asyncio.sleep(1)
-                            # Generate next candle based on last close
-                            last_close = history_candles[-1]['close']
-                            new_price = last_close + (random.random() - 0.5) * 0.0005
-                            ts = int(datetime.now().timestamp())
+                        try:
+                            while True:
+                                await asyncio.sleep(1)
+                                # Generate next candle based on last close
+                                last_close = history_candles[-1]['close']
+                                new_price = last_close + (random.random() - 0.5) * 0.0005
+                                ts = int(datetime.now().timestamp())
                             
-                            candle_update = {
-                                "time": ts, 
-                                "open": last_close, 
-                                "high": max(last_close, new_price) + 0.0001, 
-                                "low": min(last_close, new_price) - 0.0001, 
-                                "close": new_price,
-                                "asset": asset_name
-                            }
+                                candle_update = {
+                                    "time": ts, 
+                                    "open": last_close, 
+                                    "high": max(last_close, new_price) + 0.0001, 
+                                    "low": min(last_close, new_price) - 0.0001, 
+                                    "close": new_price,
+                                    "asset": asset_name
+                                }
                             
-                            # Update local history for continuity
-                            history_candles.append(candle_update)
-                            if len(history_candles) > 100: history_candles.pop(0)
+                                # Update local history for continuity
+                                history_candles.append(candle_update)
                             
-                            try:
-                                await websocket.send_json({
-                                    "type": "candle",
-                                    "data": candle_update
-                                })
-                            except:
-                                break
+                                try:
+                                    await send_json_fast(websocket, {
+                                        "type": "candle",
+                                        "data": candle_update
+                                    })
+                                except:
+                                    break
+                        except asyncio.CancelledError:
+                            return
                     
-                    # Cancel existing task if any (simple debounce)
-                    # For now just spawn
-                    asyncio.create_task(stream_live_data(asset))
+                    # Cancel existing task if any so resubscribing doesn't stack streams
+                    ws_manager.set_stream(websocket, asyncio.create_task(stream_live_data(asset)))
                     
             except Exception as e:
                 print(f"WS Error: {e}")
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import os
 
@@ -23,8 +26,13 @@ class StrategyResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class StrategyListItem(BaseModel):
+    # List view only needs metadata; code is fetched per strategy
+    id: int
+    name: str
+
 @router.post("/strategy/save")
-async def save_strategy(data: StrategySaveRequest, db: Session = Depends(get_db)):
+async def save_strategy(data: StrategySaveRequest, db: AsyncSession = Depends(get_db)):
     try:
         print(f"DEBUG: Save Request Received. Name: {data.name}, Code Len: {len(data.code)}")
         
@@ -34,42 +42,40 @@ async def save_strategy(data: StrategySaveRequest, db: Session = Depends(get_db)
             strategy_name = f"Untitled_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             print(f"DEBUG: Name missing, defaulting to {strategy_name}")
 
-        # Check if exists
-        existing = db.query(Strategy).filter(Strategy.name == strategy_name).first()
-        if existing:
-            existing.code = data.code
-            db.commit()
-            return {"success": True, "message": f"Strategy '{strategy_name}' updated", "id": existing.id}
-        else:
-            new_strategy = Strategy(name=strategy_name, code=data.code)
-            db.add(new_strategy)
-            db.commit()
-            db.refresh(new_strategy)
-            return {"success": True, "message": f"Strategy '{strategy_name}' created", "id": new_strategy.id}
+        # Single-statement upsert keyed on the unique name (no existence pre-check)
+        insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(Strategy).values(name=strategy_name, code=data.code)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Strategy.name],
+            set_={"code": stmt.excluded.code, "updated_at": func.now()},
+        ).returning(Strategy.id)
+        strategy_id = (await db.execute(stmt)).scalar_one()
+        await db.commit()
+        return {"success": True, "message": f"Strategy '{strategy_name}' saved", "id": strategy_id}
 
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-@router.get("/strategy/list", response_model=List[StrategyResponse])
-async def list_strategies(db: Session = Depends(get_db)):
-    strategies = db.query(Strategy).all()
-    # We return basic info, code is optional but included here for simplicity
-    return strategies
+@router.get("/strategy/list", response_model=List[StrategyListItem])
+async def list_strategies(db: AsyncSession = Depends(get_db)):
+    # Only select id/name so the (possibly large) code column is never loaded
+    rows = (await db.execute(select(Strategy.id, Strategy.name))).all()
+    return [StrategyListItem(id=r.id, name=r.name) for r in rows]
 
 @router.get("/strategy/{strategy_id}", response_model=StrategyResponse)
-async def get_strategy(strategy_id: int, db: Session = Depends(get_db)):
-    strategy = db.query(Strategy).filter(Strategy.id == strategy_id).first()
+async def get_strategy(strategy_id: int, db: AsyncSession = Depends(get_db)):
+    strategy = await db.get(Strategy, strategy_id)
     if not strategy:
         raise HTTPException(status_code=404, detail="Strategy not found")
     return strategy
 
 @router.delete("/strategy/{strategy_id}")
-async def delete_strategy(strategy_id: int, db: Session = Depends(get_db)):
-    strategy = db.query(Strategy).filter(Strategy.id == strategy_id).first()
+async def delete_strategy(strategy_id: int, db: AsyncSession = Depends(get_db)):
+    strategy = await db.get(Strategy, strategy_id)
     if not strategy:
         raise HTTPException(status_code=404, detail="Strategy not found")
     
-    db.delete(strategy)
-    db.commit()
+    await db.delete(strategy)
+    await db.commit()
     return {"success": True}
 
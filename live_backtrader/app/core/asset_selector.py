@@ -1,10 +1,36 @@
 import yfinance as yf
+import numpy as np
 import pandas as pd
+import asyncio
 import logging
+import threading
+from cachetools import TTLCache
 
 logger = logging.getLogger("AssetSelector")
 
+# Rankings barely move within a minute or two, so repeat callers reuse the last result
+_ranking_cache = TTLCache(maxsize=1, ttl=90)
+_ranking_lock = threading.Lock()
+
 def get_best_forex_asset():
+    with _ranking_lock:
+        cached = _ranking_cache.get("ranking")
+        if cached is not None:
+            logger.info("Asset ranking cache hit")
+            return list(cached)
+
+        logger.info("Asset ranking cache miss")
+        ranking = _rank_forex_assets()
+        # Don't pin an empty (failed) ranking for the whole TTL
+        if ranking:
+            _ranking_cache["ranking"] = ranking
+        return list(ranking)
+
+async def get_best_forex_asset_async():
+    # Yahoo downloads are blocking; keep the event loop free when called from async code
+    return await asyncio.to_thread(get_best_forex_asset)
+
+def _rank_forex_assets():
     # 1. List of Major Forex pairs (Yahoo Finance uses ticker format like 'EURUSD=X')
     tickers = [
         "AUD/CAD OTC",
@@ -34,38 +60,40 @@ def get_best_forex_asset():
 
     data_dict = {}
 
+    try:
+        # Fetch 2m data for the last day for every ticker in one batched (threaded) request
+        df_all = yf.download(formatted_tickers, period="1d", interval="2m", group_by='ticker', threads=True, progress=False)
+    except Exception as download_e:
+        print(f"Error downloading market data: {download_e}")
+        return []
+
     for ticker in formatted_tickers:
         try:
-            # Fetch hourly data for the last 5 days (approx 100 candles)
-            ticker_obj = yf.Ticker(ticker)
-            df = ticker_obj.history(period="1d", interval="2m")
+            if ticker not in df_all.columns.get_level_values(0):
+                continue
+            df = df_all[ticker]
 
             if len(df) > 0:
-                df['Close'] = pd.to_numeric(df['Close'], errors='coerce')
-                df['High'] = pd.to_numeric(df['High'], errors='coerce')
-                df['Low'] = pd.to_numeric(df['Low'], errors='coerce')
+                # Drop rows where any of Close/High/Low is missing, then work on raw arrays
+                values = df[['Close', 'High', 'Low']].to_numpy(dtype=float, na_value=np.nan)
+                values = values[~np.isnan(values).any(axis=1)]
 
-                df_cleaned = df.dropna(subset=['Close', 'High', 'Low'])
-
-                if len(df_cleaned) < 24:
+                if len(values) < 24:
                     continue
 
                 try:
-                    high = df_cleaned['High']
-                    low = df_cleaned['Low']
-                    close = df_cleaned['Close']
-
-                    tr1 = high - low
-                    tr2 = abs(high - close.shift())
-                    tr3 = abs(low - close.shift())
-                    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+                    # Only the tail is needed: 24 closes for ROC, 15 rows for the last 14 true ranges
+                    close, high, low = values[-30:].T
 
-                    atr_series = tr.rolling(window=14).mean()
-                    atr = atr_series.iloc[-1] if not atr_series.empty else float('nan')
+                    tr = np.maximum.reduce([
+                        high[1:] - low[1:],
+                        np.abs(high[1:] - close[:-1]),
+                        np.abs(low[1:] - close[:-1]),
+                    ])
+                    atr = float(tr[-14:].mean())
 
-                    current_close = float(close.iloc[-1])
-                    previous_close_24h = float(close.iloc[-24])
-                    atr = float(atr)
+                    current_close = float(close[-1])
+                    previous_close_24h = float(close[-24])
 
                     if pd.isna(current_close) or pd.isna(previous_close_24h) or previous_close_24h == 0:
                         roc = float('nan')
@@ -91,10 +119,8 @@ def get_best_forex_asset():
                         }
                 except Exception as calc_e:
                     print(f"Error during calculation for {ticker}: {calc_e}")
-            else:
-                 pass 
-        except Exception as download_e:
-            print(f"Error downloading {ticker}: {download_e}")
+        except Exception as ticker_e:
+            print(f"Error processing {ticker}: {ticker_e}")
 
     if not data_dict:
         return []
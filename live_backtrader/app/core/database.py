@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy.engine import make_url
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
 Base = declarative_base()
@@ -28,17 +30,37 @@ class Strategy(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
+# Map sync driver URLs (e.g. sqlite:///./trading.db from .env) onto their async drivers
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def get_async_url(url: str):
+    db_url = make_url(url)
+    if db_url.drivername in ASYNC_DRIVERS:
+        db_url = db_url.set(drivername=ASYNC_DRIVERS[db_url.drivername])
+    return db_url
+
+DATABASE_URL = get_async_url(settings.DATABASE_URL)
+
+# SQLite would otherwise fall back to a pool that ignores pool_size, so pin the queue pool explicitly
+engine = create_async_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if DATABASE_URL.get_backend_name() == "sqlite" else {},
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    pool_recycle=1800,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
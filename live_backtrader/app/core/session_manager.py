@@ -8,6 +8,7 @@ class SessionManager:
         if cls._instance is None:
             cls._instance = super(SessionManager, cls).__new__(cls)
             cls._instance.ssid = ""
+            cls._instance.ssid_source = "memory"
             cls._instance.load_ssid()
         return cls._instance
 
@@ -17,14 +18,18 @@ class SessionManager:
             try:
                 with open("ssid.txt", "r") as f:
                     self.ssid = f.read().strip()
+                self.ssid_source = "file"
             except:
                 pass
         
         if not self.ssid:
              self.ssid = os.getenv("POCKET_OPTION_SSID", "")
+             self.ssid_source = "env"
 
-    def set_ssid(self, ssid: str):
+    def set_ssid(self, ssid: str, source: str = "memory"):
+        # The in-memory copy is what readers use; file (and DB, via the API) are write-through
         self.ssid = ssid.strip()
+        self.ssid_source = source
         # Save to file persistence
         try:
             with open("ssid.txt", "w") as f:
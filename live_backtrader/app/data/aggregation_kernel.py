@@ -0,0 +1,192 @@
+import numpy as np
+import logging
+
+logger = logging.getLogger("AggregationKernel")
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+    logger.info("numba not installed; using the NumPy OHLCV aggregation kernel.")
+
+def _aggregate_ohlcv_numpy(ts: np.ndarray, px: np.ndarray, period: int):
+    """
+    Bucket time-ordered ticks into candles.
+    Returns (times[k], ohlc[k, 4], counts[k]) with one row per bucket.
+    """
+    buckets = (ts // period) * period
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    ends = np.r_[starts[1:], px.size]
+
+    ohlc = np.empty((starts.size, 4), dtype=np.float64)
+    ohlc[:, 0] = px[starts]
+    ohlc[:, 1] = np.maximum.reduceat(px, starts)
+    ohlc[:, 2] = np.minimum.reduceat(px, starts)
+    ohlc[:, 3] = px[ends - 1]
+    return buckets[starts], ohlc, ends - starts
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _aggregate_ohlcv_jit(ts, px, period):
+        # Single pass; the running candle lives in the output row being filled
+        n = ts.shape[0]
+        times = np.empty(n, np.int64)
+        ohlc = np.empty((n, 4), np.float64)
+        counts = np.empty(n, np.int64)
+        k = -1
+        current = 0
+        for i in range(n):
+            bucket = (ts[i] // period) * period
+            p = px[i]
+            if k < 0 or bucket != current:
+                k += 1
+                current = bucket
+                times[k] = bucket
+                ohlc[k, 0] = p
+                ohlc[k, 1] = p
+                ohlc[k, 2] = p
+                ohlc[k, 3] = p
+                counts[k] = 1
+            else:
+                if p > ohlc[k, 1]:
+                    ohlc[k, 1] = p
+                if p < ohlc[k, 2]:
+                    ohlc[k, 2] = p
+                ohlc[k, 3] = p
+                counts[k] += 1
+        return times[:k + 1], ohlc[:k + 1], counts[:k + 1]
+
+    aggregate_ohlcv = _aggregate_ohlcv_jit
+else:
+    aggregate_ohlcv = _aggregate_ohlcv_numpy
+
+# Live bar state layout for step_bar: the developing bar, last accepted tick ts, has-bar flag,
+# and the ts where the current bucket ends (ticks below it skip the floor division)
+BAR_TIME, BAR_OPEN, BAR_HIGH, BAR_LOW, BAR_CLOSE, BAR_VOLUME, BAR_LAST_TS, BAR_ACTIVE, BAR_END = range(9)
+BAR_STALE, BAR_OPENED, BAR_UPDATED, BAR_CLOSED = 0, 1, 2, 3
+
+def new_bar_state():
+    # The compiled kernel wants a float64 vector; the Python fallback indexes a list ~2.5x faster
+    return np.zeros(9, dtype=np.float64) if njit is not None else [0.0] * 9
+
+def new_closed_bar():
+    # Receives the finished bar's first six fields from step_bar
+    return np.zeros(6, dtype=np.float64) if njit is not None else [0.0] * 6
+
+def _step_bar_py(state, closed, ts, o, h, l, c, v, tf):
+    """
+    Fold one OHLCV tick into the live bar held in `state`.
+    Returns BAR_STALE for duplicate/late ticks, BAR_CLOSED when the tick starts a new
+    bucket (the finished bar is copied into closed[0:6]), else BAR_OPENED/BAR_UPDATED.
+    """
+    if ts <= state[BAR_LAST_TS]:
+        return BAR_STALE
+    state[BAR_LAST_TS] = ts
+    if ts < state[BAR_END]:
+        # Same bucket (ts only moves forward): one compare instead of flooring every tick
+        if h > state[BAR_HIGH]:
+            state[BAR_HIGH] = h
+        if l < state[BAR_LOW]:
+            state[BAR_LOW] = l
+        state[BAR_CLOSE] = c
+        state[BAR_VOLUME] += v
+        return BAR_UPDATED
+    bucket = (ts // tf) * tf
+    code = BAR_OPENED
+    if state[BAR_ACTIVE] != 0.0:
+        for i in range(6):
+            closed[i] = state[i]
+        code = BAR_CLOSED
+    state[BAR_TIME] = bucket
+    state[BAR_END] = bucket + tf
+    state[BAR_OPEN] = o
+    state[BAR_HIGH] = h
+    state[BAR_LOW] = l
+    state[BAR_CLOSE] = c
+    state[BAR_VOLUME] = v
+    state[BAR_ACTIVE] = 1.0
+    return code
+
+if njit is not None:
+    # cache=True keeps the compiled kernel on disk across engine restarts
+    step_bar = njit(cache=True)(_step_bar_py)
+else:
+    step_bar = _step_bar_py
+
+def _fold_ticks_py(state, rows, ts, o, h, l, c, v, tf):
+    """
+    step_bar over a burst of buffered ticks. Bars finished inside the burst are copied into
+    rows[0:k] (rows needs one row per tick). Returns (k, status), status summing up the burst
+    like a single step_bar call: BAR_CLOSED if any bar closed, else BAR_OPENED/UPDATED/STALE.
+    """
+    k = 0
+    status = BAR_STALE
+    for i in range(len(ts)):
+        s = step_bar(state, rows[k], ts[i], o[i], h[i], l[i], c[i], v[i], tf)
+        if s == BAR_CLOSED:
+            k += 1
+            status = BAR_CLOSED
+        elif s == BAR_OPENED:
+            if status != BAR_CLOSED:
+                status = BAR_OPENED
+        elif s == BAR_UPDATED and status == BAR_STALE:
+            status = BAR_UPDATED
+    return k, status
+
+if njit is not None:
+    fold_ticks = njit(cache=True)(_fold_ticks_py)
+else:
+    def fold_ticks(state, rows, ts, o, h, l, c, v, tf):
+        # Plain floats: list indexing beats NumPy scalar access in the Python loop
+        return _fold_ticks_py(state, rows, ts.tolist(), o.tolist(), h.tolist(), l.tolist(),
+                              c.tolist(), v.tolist(), tf)
+
+def _signal_trades_py(times, signals, expiry):
+    """
+    Replay per-candle signals (+1 CALL, -1 PUT, 0 none) with one open trade at a time.
+    Returns (entry_idx, exit_idx, direction) per trade; exit_idx is -1 while still open.
+    A trade placed at candle i expires at the first candle j with times[j] >= times[i] + expiry.
+    """
+    n = times.shape[0]
+    entries = np.empty(n, np.int64)
+    exits = np.empty(n, np.int64)
+    dirs = np.empty(n, np.int8)
+    k = 0
+    active = False
+    expires_at = 0
+    for i in range(n):
+        if active and times[i] >= expires_at:
+            exits[k - 1] = i
+            active = False
+        if not active:
+            s = signals[i]
+            if s != 0:
+                entries[k] = i
+                exits[k] = -1
+                dirs[k] = 1 if s > 0 else -1
+                expires_at = times[i] + expiry
+                active = True
+                k += 1
+    return entries[:k], exits[:k], dirs[:k]
+
+if njit is not None:
+    signal_trades = njit(cache=True)(_signal_trades_py)
+else:
+    signal_trades = _signal_trades_py
+
+def robust_price_mask(ts: np.ndarray, px: np.ndarray, period: int, r: float) -> np.ndarray:
+    """
+    Log-median fence: keep ticks whose price is within a factor r of their bucket's median,
+    i.e. |log(p) - median(log(p))| <= log(r). Fully vectorized over all buckets.
+    """
+    x = np.log(px)
+    buckets = (ts // period) * period
+
+    # Sort log-prices within each (already ordered) bucket to read medians by index
+    order = np.lexsort((x, buckets))
+    sorted_x = x[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    counts = np.diff(np.r_[starts, px.size])
+    medians = 0.5 * (sorted_x[starts + (counts - 1) // 2] + sorted_x[starts + counts // 2])
+
+    return np.abs(x - np.repeat(medians, counts)) <= np.log(r)
@@ -1,9 +1,21 @@
 from typing import Dict, List, Any
 import logging
 from datetime import datetime
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger("CandleNormalizer")
 
+TIME_KEYS = ['time', 'timestamp', 't']
+FIELD_KEYS = {
+    'open': ['open', 'Open', 'o'],
+    'high': ['high', 'High', 'h'],
+    'low': ['low', 'Low', 'l'],
+    'close': ['close', 'Close', 'c'],
+    'volume': ['volume', 'Volume', 'v'],
+}
+EPOCH = pd.Timestamp(0, tz='UTC')
+
 class CandleNormalizer:
     @staticmethod
     def normalize_candle(candle: Any, asset: str) -> Dict[str, Any]:
@@ -53,12 +65,55 @@ class CandleNormalizer:
 
     @staticmethod
     def normalize_list(candles: List[Any], asset: str) -> List[Dict[str, Any]]:
-        normalized = []
-        for c in candles:
-            n = CandleNormalizer.normalize_candle(c, asset)
-            if n:
-                normalized.append(n)
-        
-        # Sort by time
-        normalized.sort(key=lambda x: x['time'])
-        return normalized
+        """
+        Vectorized normalize_candle over a whole batch, sorted by time.
+        Same rows as the per-row path: a field that is present but not numeric drops
+        the row, missing fields become 0.0 and an unparseable time becomes 0.
+        """
+        records = [c if isinstance(c, dict) else c.__dict__ for c in candles
+                   if isinstance(c, dict) or hasattr(c, '__dict__')]
+        if not records:
+            return []
+
+        try:
+            df = pd.DataFrame.from_records(records)
+
+            # Time: numeric epochs as-is, anything else parsed as ISO datetime
+            time_raw = CandleNormalizer._coalesce(df, TIME_KEYS)
+            time_num = pd.to_numeric(time_raw, errors='coerce')
+            time_dt = pd.to_datetime(time_raw.where(time_num.isna()), errors='coerce', utc=True)
+            time_iso = (time_dt - EPOCH) // pd.Timedelta(seconds=1)
+            time_ts = time_num.fillna(time_iso).fillna(0)
+
+            out = pd.DataFrame({'time': time_ts})
+            for field, keys in FIELD_KEYS.items():
+                raw = CandleNormalizer._coalesce(df, keys)
+                # Coerce, then drop rows where a given value failed to parse (float() raising before)
+                values = pd.to_numeric(raw, errors='coerce')
+                out[field] = values.where(raw.notna() | values.notna(), 0.0).astype(float)
+
+            out = out.dropna()
+            out['time'] = out['time'].astype('int64')
+            out['asset'] = asset
+
+            # Sort by time
+            out.sort_values('time', kind='stable', inplace=True)
+            return out.to_dict('records')
+        except Exception as e:
+            # Unexpected shapes (nested values, odd dtypes): fall back to the per-row path
+            logger.error(f"Error normalizing candles, falling back to per-row: {e}")
+            normalized = []
+            for c in candles:
+                n = CandleNormalizer.normalize_candle(c, asset)
+                if n:
+                    normalized.append(n)
+            normalized.sort(key=lambda x: x['time'])
+            return normalized
+
+    @staticmethod
+    def _coalesce(df: pd.DataFrame, keys: List[str]) -> pd.Series:
+        """First non-null value across the alias columns present in df."""
+        present = [k for k in keys if k in df.columns]
+        if not present:
+            return pd.Series(np.nan, index=df.index)
+        return df[present].bfill(axis=1).iloc[:, 0]
@@ -6,6 +6,11 @@ import asyncio
 
 logger = logging.getLogger("PocketHistory")
 
+BATCH_WINDOW = 0.005 # seconds to wait for more requests before issuing a batch
+MAX_BATCH = 16
+READY_POLL = 0.02 # seconds between readiness probes
+READY_TIMEOUT = 2.0 # never wait longer than the old fixed warmup
+
 from app.core.session_manager import session_manager
 
 class PocketOptionHistory:
@@ -15,6 +20,11 @@ class PocketOptionHistory:
         self._manual_ssid = ssid 
         self.api: Optional[PocketOptionAsync] = None
 
+        # Request coalescer: callers enqueue, one worker issues small concurrent batches
+        self._req_queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
     async def connect(self):
         current_ssid = self._manual_ssid or session_manager.get_ssid()
         if not current_ssid:
@@ -22,9 +32,28 @@ class PocketOptionHistory:
             raise ValueError("No SSID found. Please set SSID in Account settings.")
 
         if not self.api:
+            self._ready.clear()
             self.api = PocketOptionAsync(current_ssid)
-            # Basic connection check or wait
-            await asyncio.sleep(2) 
+            try:
+                await asyncio.wait_for(self._wait_ready(), timeout=READY_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Connection not confirmed after {READY_TIMEOUT}s, continuing anyway")
+                self._ready.set()
+        else:
+            # Concurrent first callers wait on the same readiness instead of a second warmup
+            await self._ready.wait()
+
+    async def _wait_ready(self):
+        # The library exposes no on-open hook; a valid balance (>= 0) means the WS is synced
+        while True:
+            try:
+                bal = await self.api.balance()
+                if isinstance(bal, (int, float)) and bal >= 0:
+                    self._ready.set()
+                    return
+            except Exception:
+                pass
+            await asyncio.sleep(READY_POLL)
 
     async def fetch_candles(self, asset: str, period: int, count: int = 100) -> List[Dict]:
         """
@@ -33,7 +62,54 @@ class PocketOptionHistory:
         """
         if not self.api:
             await self.connect()
-            
+
+        if self._worker is None or self._worker.done():
+            self._req_queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._batch_worker())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._req_queue.put(((asset, period, count), future))
+        return await future
+
+    async def _batch_worker(self):
+        batch = []
+        try:
+            while True:
+                batch = [await self._req_queue.get()]
+                # Give concurrent callers a moment to join this batch
+                await asyncio.sleep(BATCH_WINDOW)
+                while len(batch) < MAX_BATCH and not self._req_queue.empty():
+                    batch.append(self._req_queue.get_nowait())
+
+                # Identical requests in the same batch share one upstream call
+                waiters: Dict[tuple, List[asyncio.Future]] = {}
+                for key, future in batch:
+                    waiters.setdefault(key, []).append(future)
+
+                keys = list(waiters)
+                results = await asyncio.gather(*(self._fetch(*key) for key in keys), return_exceptions=True)
+                for key, result in zip(keys, results):
+                    for future in waiters[key]:
+                        if future.done():
+                            continue
+                        if isinstance(result, BaseException):
+                            future.set_exception(result)
+                        else:
+                            # Callers may trim/mutate their candles, so each gets its own copies
+                            future.set_result([dict(c) for c in result])
+                batch = []
+        except asyncio.CancelledError:
+            # close(): callers still waiting in this batch or the queue must not hang
+            while not self._req_queue.empty():
+                batch.append(self._req_queue.get_nowait())
+            for _, future in batch:
+                future.cancel()
+            raise
+
+    async def _fetch(self, asset: str, period: int, count: int) -> List[Dict]:
+        if not self.api:
+            await self.connect()
+
         try:
             logger.info(f"Fetching {count} candles for {asset} (period={period})")
             
@@ -60,9 +136,17 @@ class PocketOptionHistory:
             return []
             
     async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
         if self.api:
             try:
                 await self.api.disconnect()
             except:
                 pass
             self.api = None
+            self._ready.clear()
@@ -1,15 +1,40 @@
 import asyncio
+import collections
+import dataclasses
+import functools
 import logging
-from typing import Dict, Callable, Optional
+from typing import Dict, List, Tuple, Callable, Optional
 from datetime import datetime
+import numpy as np
+from app.data.aggregation_kernel import aggregate_ohlcv, robust_price_mask
 from BinaryOptionsToolsV2.pocketoption import PocketOptionAsync
 
 logger = logging.getLogger("PocketRealtime")
 
+# Fan-out yields to the event loop after this many sends so ticks and WS reads keep flowing
+BROADCAST_BATCH_SIZE = 50
+
+@dataclasses.dataclass(slots=True)
+class Candle:
+    """Compact OHLCV record; attribute writes avoid per-tick dict hashing."""
+    time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+    asset: str
+
+    def to_dict(self) -> Dict:
+        # Only needed at the serialization boundary
+        return dataclasses.asdict(self)
+
 class CandleAggregator:
-    def __init__(self, period: int = 60):
+    def __init__(self, period: int = 60, robust_r: Optional[float] = None):
         self.period = period
-        self.current_candle: Optional[Dict] = None
+        # Batch path only: drop ticks more than a factor robust_r away from their bucket median
+        self.robust_r = robust_r
+        self.current_candle: Optional[Candle] = None
         self.on_candle_close: Optional[Callable] = None
         self.on_tick_update: Optional[Callable] = None
 
@@ -17,39 +42,109 @@ class CandleAggregator:
         # Calculate candle start time (floor to nearest period)
         candle_time = (timestamp // self.period) * self.period
         
-        if self.current_candle and self.current_candle['time'] != candle_time:
+        if self.current_candle and self.current_candle.time != candle_time:
             # Close previous candle
             if self.on_candle_close:
                 self.on_candle_close(self.current_candle)
             self.current_candle = None
 
         if not self.current_candle:
-            self.current_candle = {
-                'time': candle_time,
-                'open': price,
-                'high': price,
-                'low': price,
-                'close': price,
-                'volume': 0,
-                'asset': asset
-            }
+            self.current_candle = Candle(candle_time, price, price, price, price, 0, asset)
         else:
             c = self.current_candle
-            c['high'] = max(c['high'], price)
-            c['low'] = min(c['low'], price)
-            c['close'] = price
-            c['volume'] += 1  # Tick volume
+            # Plain comparisons: no builtin max/min call on the hottest line
+            if price > c.high: c.high = price
+            if price < c.low: c.low = price
+            c.close = price
+            c.volume += 1  # Tick volume
+
+        if self.on_tick_update:
+            self.on_tick_update(self.current_candle)
+
+    def process_tick_batch(self, prices: np.ndarray, timestamps: np.ndarray, asset: str):
+        """
+        Vectorized process_tick over time-ordered tick arrays (replay / history preload).
+        Produces the same candles as feeding the ticks one by one, but fires
+        on_tick_update only once for the final partial candle.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if prices.size == 0:
+            return
+
+        if self.robust_r:
+            keep = robust_price_mask(timestamps, prices, self.period, self.robust_r)
+            prices = prices[keep]
+            timestamps = timestamps[keep]
+            if prices.size == 0:
+                return
+
+        # One pass over the ticks (Numba-compiled when available)
+        bucket_times, ohlc, bucket_counts = aggregate_ohlcv(timestamps, prices, self.period)
+        times = bucket_times.tolist()
+        opens, highs, lows, closes = ohlc.T.tolist()
+        counts = bucket_counts.tolist()
+
+        for i, candle_time in enumerate(times):
+            c = self.current_candle
+            if c and c.time == candle_time:
+                # Continue the open candle (only possible for the first group)
+                if highs[i] > c.high: c.high = highs[i]
+                if lows[i] < c.low: c.low = lows[i]
+                c.close = closes[i]
+                c.volume += counts[i]
+                continue
+
+            if c and self.on_candle_close:
+                self.on_candle_close(c)
+
+            # First tick opens the candle with volume 0, like process_tick
+            self.current_candle = Candle(candle_time, opens[i], highs[i], lows[i], closes[i], counts[i] - 1, asset)
 
         if self.on_tick_update:
             self.on_tick_update(self.current_candle)
 
+async def _guard_async(callback, coro):
+    try:
+        await coro
+    except Exception as e:
+        logger.debug(f"Guarded listener {callback!r} failed: {e}")
+
+def _guarded(callback, candle):
+    try:
+        res = callback(candle)
+    except Exception as e:
+        logger.debug(f"Guarded listener {callback!r} failed: {e}")
+        return None
+    if asyncio.iscoroutine(res):
+        # Async listeners fail when awaited, so the dispatcher gets a coroutine that guards itself
+        return _guard_async(callback, res)
+    return res
+
 class PocketOptionRealtime:
     def __init__(self, ssid: str):
         self.ssid = ssid
         self.api: Optional[PocketOptionAsync] = None
         self.running = False
         self.aggregators: Dict[str, CandleAggregator] = {} # asset -> aggregator
-        self.subscribers = [] # List of callbacks
+        # Hot path indexes aggregators by an integer id assigned at subscribe time
+        self._asset_index: Dict[str, int] = {}
+        self._agg_array: List[CandleAggregator] = []
+        self._asset_names: List[str] = []
+        # Immutable snapshot of callbacks, rebuilt on add_listener; iterated without per-call try/except
+        self.subscribers: Tuple[Callable, ...] = ()
+
+        # Ticks only queue the asset id (once until drained); _dispatch reads the live candle itself
+        self._pending = collections.deque()
+        self._queued: List[bool] = []
+        # Finished candles are never mutated again, so they are queued as-is
+        self._closed = collections.deque()
+        self._waker: Optional[asyncio.Future] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._recv_timeout: Optional[float] = None # None = plain recv(), no per-message timeout wrapper
+        # One subscription reader per asset id, started by listen() (or subscribe_asset once listening)
+        self._readers: Dict[int, asyncio.Task] = {}
+        self._stopped: Optional[asyncio.Event] = None
 
     async def connect(self):
         logger.info("Connecting to Realtime Stream...")
@@ -58,49 +153,146 @@ class PocketOptionRealtime:
         # await self.api.connect_websocket() 
         self.running = True
 
-    async def subscribe_asset(self, asset: str, period: int = 60):
-        if asset not in self.aggregators:
+    async def subscribe_asset(self, asset: str, period: int = 60) -> int:
+        """Returns the asset id to pass to dispatch_tick."""
+        asset_id = self._asset_index.get(asset)
+        if asset_id is None:
             agg = CandleAggregator(period)
-            agg.on_tick_update = self._broadcast_update
+            asset_id = len(self._agg_array)
+            agg.on_tick_update = functools.partial(self._broadcast_update, asset_id)
+            agg.on_candle_close = self._closed.append
             self.aggregators[asset] = agg
-            
-        # In a real impl, we'd send a sub message to the WS
-        # await self.api.websocket.subscribe(asset)
 
-    def _broadcast_update(self, candle):
-        for sub in self.subscribers:
-            try:
-                sub(candle)
-            except:
-                pass
+            self._asset_index[asset] = asset_id
+            self._agg_array.append(agg)
+            self._asset_names.append(asset)
+            self._queued.append(False)
+
+        if self._dispatch_task is not None and asset_id not in self._readers:
+            self._start_reader(asset_id)
+        return asset_id
+
+    def _start_reader(self, asset_id: int):
+        self._readers[asset_id] = asyncio.create_task(self._read_symbol(asset_id))
+
+    def dispatch_tick(self, asset_id: int, price: float, timestamp: int):
+        # Resolve the asset id once per message; this is a plain list index, no string hashing
+        self._agg_array[asset_id].process_tick(price, timestamp, self._asset_names[asset_id])
+
+    def _broadcast_update(self, asset_id, candle):
+        # No per-tick copy: the id is queued once and the latest candle state is read at drain time
+        if self._queued[asset_id]:
+            return
+        self._queued[asset_id] = True
+        self._pending.append(asset_id)
+        if self._waker is not None and not self._waker.done():
+            self._waker.set_result(None)
+
+    async def _dispatch(self):
+        """
+        Single consumer: sleeps on a Future until ticks are queued, then drains
+        the whole deque and delivers it. Async listeners are awaited in order; with
+        a large fan-out it yields to the loop every BROADCAST_BATCH_SIZE sends.
+        """
+        loop = asyncio.get_running_loop()
+        while self.running:
+            if not self._pending:
+                await self._waker
+            self._waker = loop.create_future()
+
+            # Candles closed since the last drain go first, then each updated asset's live candle
+            batch = list(self._closed)
+            self._closed.clear()
+            queued = self._queued
+            aggs = self._agg_array
+            for asset_id in self._pending:
+                queued[asset_id] = False
+                batch.append(aggs[asset_id].current_candle)
+            self._pending.clear()
+
+            sent = 0
+            # Small fan-out keeps the plain synchronous loop (no extra yields)
+            yield_every = BROADCAST_BATCH_SIZE if len(self.subscribers) >= BROADCAST_BATCH_SIZE else 0
+            for sub in self.subscribers:
+                try:
+                    for candle in batch:
+                        res = sub(candle)
+                        if asyncio.iscoroutine(res):
+                            await res
+                        sent += 1
+                        if yield_every and sent % yield_every == 0:
+                            await asyncio.sleep(0)
+                except Exception as e:
+                    # Last-resort guard so one faulty trusted listener can't kill dispatching
+                    logger.error(f"Listener {sub!r} failed: {e}")
 
     async def listen(self):
         """
-        Main loop to listen for ticks
+        Main loop to listen for ticks: one subscribe_symbol reader per asset feeds
+        dispatch_tick, the dispatcher fans the updates out. Returns after close().
         """
         if not self.api:
             await self.connect()
 
-        # Mock implementation of listening loop, as the real library interface is unknown
-        # Ideally: async for msg in self.api.websocket: ...
-        
+        loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._waker = loop.create_future()
+        self._dispatch_task = asyncio.create_task(self._dispatch())
+        for asset_id in range(len(self._agg_array)):
+            if asset_id not in self._readers:
+                self._start_reader(asset_id)
+
         logger.info("Listening for ticks...")
-        import random
+        await self._stopped.wait()
+
+    async def _read_symbol(self, asset_id: int):
+        asset = self._asset_names[asset_id]
+        dispatch = self.dispatch_tick
         while self.running:
-            # Simulate generic tick for now or read from real API if method known
-            # Real Lib usage: 
-            # msg = await self.api.websocket.recv()
-            # parse msg -> timestamp, price, asset
-            
-            # Using a mock sleep to prevent CPU burn if API not hooked up
-            await asyncio.sleep(0.1) 
-            
-            # TODO: Integrate actual BinaryOptionsToolsV2 websocket read
-            
+            try:
+                stream = await self.api.subscribe_symbol(asset)
+                while self.running:
+                    # Updates arrive as parsed dicts, e.g. {"asset": ..., "timestamp": ..., "price": ...}
+                    tick = await self._recv(stream)
+                    ts = tick.get("timestamp", tick.get("time"))
+                    price = tick.get("close", tick.get("price"))
+                    if ts is None or price is None:
+                        continue
+                    ts = int(ts)
+                    if ts > 10_000_000_000: # Milliseconds
+                        ts //= 1000
+                    dispatch(asset_id, float(price), ts)
+            except asyncio.CancelledError:
+                raise
+            except StopAsyncIteration:
+                logger.warning(f"Stream for {asset} ended, resubscribing")
+            except Exception as e:
+                logger.error(f"Stream for {asset} failed: {e}")
+            await asyncio.sleep(1)
+
+    async def _recv(self, stream):
+        # Hot path: skip the wait_for/Timeout allocation entirely when no timeout is configured
+        if self._recv_timeout is None:
+            return await stream.__anext__()
+        return await asyncio.wait_for(stream.__anext__(), self._recv_timeout)
+
     def add_listener(self, callback):
-        self.subscribers.append(callback)
+        """Trusted callback: called directly, exceptions abort its current batch."""
+        self.subscribers = self.subscribers + (callback,)
+
+    def add_guarded_listener(self, callback):
+        """Untrusted callback: exceptions are swallowed per call inside a pre-bound wrapper."""
+        self.add_listener(functools.partial(_guarded, callback))
 
     async def close(self):
         self.running = False
+        for task in self._readers.values():
+            task.cancel()
+        self._readers.clear()
+        if self._dispatch_task:
+            self._dispatch_task.cancel()
+            self._dispatch_task = None
+        if self._stopped is not None:
+            self._stopped.set()
         if self.api:
             await self.api.disconnect()
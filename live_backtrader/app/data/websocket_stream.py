@@ -1,19 +1,41 @@
+import asyncio
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
+from typing import Dict, List
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.stream_tasks: Dict[WebSocket, asyncio.Task] = {} # One live stream per connection
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.cancel_stream(websocket)
+        # May already be gone: a failed broadcast drops the connection before its handler exits
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+
+    def set_stream(self, websocket: WebSocket, task: asyncio.Task):
+        # A new subscription replaces (and stops) the previous stream for this connection
+        self.cancel_stream(websocket)
+        self.stream_tasks[websocket] = task
+
+    def cancel_stream(self, websocket: WebSocket):
+        old = self.stream_tasks.pop(websocket, None)
+        if old:
+            old.cancel()
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+        # Encode once for every connection (send_json would re-run json.dumps per socket)
+        text = orjson.dumps(message).decode()
+        # Concurrent sends: one slow or dead client no longer holds up (or aborts) the rest
+        connections = list(self.active_connections)
+        results = await asyncio.gather(*(c.send_text(text) for c in connections), return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
 
 manager = ConnectionManager()
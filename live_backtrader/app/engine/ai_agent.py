@@ -1,5 +1,16 @@
+import ast
+import numpy as np
 from typing import Dict, Any
 
+# Strategy code may only import these (top-level package names)
+ALLOWED_MODULES = {'math', 'statistics', 'random', 'datetime', 'time', 'collections', 'itertools',
+                   'functools', 'typing', 'dataclasses', 'numpy', 'pandas', 'backtrader'}
+# Builtins that reach modules, frames or the filesystem without an import statement
+FORBIDDEN_NAMES = {'__import__', 'eval', 'exec', 'compile', 'open', 'input', 'breakpoint',
+                   'getattr', 'setattr', 'delattr', 'globals', 'locals', 'vars', '__builtins__'}
+# Dunder attributes strategies legitimately use (super().__init__() in a bt.Strategy subclass)
+ALLOWED_DUNDERS = {'__init__'}
+
 class AITradingAgent:
     """
     AI Agent that analyzes strategy performance and suggests improvements.
@@ -28,26 +39,55 @@ class AITradingAgent:
             score -= 10
             
         trades = result.get('trades', [])
-        curr_loss_streak = 0
-        max_loss_streak = 0
-        
-        # Mock analysis if no trade details
+        max_loss_streak = AITradingAgent.max_loss_streak(trades)
         
         return {
             "score": score,
             "profit_pct": profit_pct,
+            "max_loss_streak": max_loss_streak,
             "warnings": warnings,
             "suggestions": suggestions,
             "is_production_safe": score > 70
         }
 
+    @staticmethod
+    def max_loss_streak(trades) -> int:
+        """
+        Longest run of consecutive losing trades, computed with a NumPy run-length pass.
+        """
+        if not trades:
+            return 0
+        pnl = np.fromiter((t.get('pnl', t.get('profit', 0)) or 0 for t in trades), dtype=np.float64, count=len(trades))
+        losses = pnl < 0
+        # Gaps between non-losing trades (with sentinels at both ends) are loss runs + 1
+        resets = np.flatnonzero(~losses)
+        return int(np.diff(np.r_[-1, resets, losses.size]).max() - 1)
+
     @staticmethod
     def validate_code(code: str) -> bool:
         """
-        Static analysis of user code for infinite loops or forbidden imports.
+        Static lint of user code: allowlisted imports only, no dunder attribute access,
+        no builtins that reach modules or the filesystem. This is NOT a sandbox: code that
+        passes still runs in-process with full builtins, so only run code you trust.
         """
-        forbidden = ['os.', 'sys.', 'subprocess', 'import os', 'import sys']
-        for f in forbidden:
-            if f in code:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return False
+
+        # Single pass over the AST: ignores strings/comments, catches any import spelling
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                if any(alias.name.split('.')[0] not in ALLOWED_MODULES for alias in node.names):
+                    return False
+            elif isinstance(node, ast.ImportFrom):
+                # Relative imports (level > 0) would resolve against the app package
+                if node.level or (node.module or '').split('.')[0] not in ALLOWED_MODULES:
+                    return False
+            elif isinstance(node, ast.Attribute):
+                # Dunder walks (().__class__.__base__.__subclasses__()...) are the usual escape
+                if node.attr.startswith('__') and node.attr not in ALLOWED_DUNDERS:
+                    return False
+            elif isinstance(node, ast.Name) and node.id in FORBIDDEN_NAMES:
                 return False
         return True
@@ -0,0 +1,14 @@
+"""
+Entry points for backtest worker processes.
+Kept small on purpose: this is what a worker imports, not the server's main module.
+"""
+
+def init_worker():
+    # Pay the backtrader/pandas/matplotlib import once per worker, not on its first job
+    # (already done when the forkserver preloaded it)
+    import app.engine.backtester  # noqa: F401
+
+def run_backtest(data_list: list, strategy_code: str, strategy_params: dict):
+    # Top-level so it can be pickled to the worker process; the worker's code/feed caches persist across jobs
+    from app.engine.backtester import Backtester
+    return Backtester(data_list, strategy_code, strategy_params).run()
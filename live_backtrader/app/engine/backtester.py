@@ -1,17 +1,129 @@
 import backtrader as bt
+import numpy as np
 import pandas as pd
 from app.engine.feeds import PandasData
+from app.engine import backtest_worker
 import logging
 import traceback
 import sys
-from io import StringIO, BytesIO
+import ast
+import hashlib
+import asyncio
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from types import CodeType
+from typing import Dict, Optional, Tuple
+from io import TextIOBase, BytesIO
+from contextlib import redirect_stdout
+from collections import deque, OrderedDict
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import base64
 
+# Let Agg drop near-collinear path vertices aggressively (dense candle plots)
+plt.rcParams['path.simplify_threshold'] = 1.0
+
 logger = logging.getLogger("Backtester")
 
+# Compiled strategy code keyed by source hash -> (code object, strategy class name or None)
+_CODE_CACHE: Dict[bytes, Tuple[CodeType, Optional[str]]] = {}
+_CODE_CACHE_MAX = 64
+
+# Built price DataFrames keyed by a hash of the raw OHLCV columns (parameter sweeps reuse the same data)
+_FEED_CACHE: "OrderedDict[bytes, pd.DataFrame]" = OrderedDict()
+_FEED_CACHE_MAX = 16
+
+def _is_strategy_base(node: ast.expr) -> bool:
+    # Matches `bt.Strategy` and a bare `Strategy`
+    if isinstance(node, ast.Attribute):
+        return node.attr == 'Strategy'
+    return isinstance(node, ast.Name) and node.id == 'Strategy'
+
+def _parse_and_compile(code: str) -> Tuple[CodeType, Optional[str]]:
+    tree = ast.parse(code, '<strategy>')
+    cls_name = None
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and any(_is_strategy_base(b) for b in node.bases):
+            cls_name = node.name
+            break
+    return compile(tree, '<strategy>', 'exec'), cls_name
+
+def _get_compiled(code: str) -> Tuple[CodeType, Optional[str]]:
+    key = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+    entry = _CODE_CACHE.get(key)
+    if entry is None:
+        entry = _parse_and_compile(code)
+        if len(_CODE_CACHE) >= _CODE_CACHE_MAX:
+            _CODE_CACHE.pop(next(iter(_CODE_CACHE)))
+        _CODE_CACHE[key] = entry
+    return entry
+
+def _get_frame(t, o, h, l, c, v) -> pd.DataFrame:
+    hasher = hashlib.blake2b(digest_size=16)
+    for col in (t, o, h, l, c, v):
+        hasher.update(col.tobytes())
+    key = hasher.digest()
+    df = _FEED_CACHE.get(key)
+    if df is not None:
+        _FEED_CACHE.move_to_end(key)
+        return df
+    df = pd.DataFrame(
+        {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v},
+        index=pd.DatetimeIndex(pd.to_datetime(t, unit='s'), name='time'),
+    )
+    _FEED_CACHE[key] = df
+    if len(_FEED_CACHE) > _FEED_CACHE_MAX:
+        _FEED_CACHE.popitem(last=False)
+    return df
+
+BACKTEST_WORKERS = 2 # Small and fixed: each worker holds its own code/feed caches
+
+def _mp_context():
+    # forkserver forks workers from a server that preloaded only the backtest stack, so they
+    # never re-import the web app's __main__; spawn where it's unavailable (Windows)
+    if 'forkserver' in mp.get_all_start_methods():
+        ctx = mp.get_context('forkserver')
+        ctx.set_forkserver_preload(['app.engine.backtester'])
+        return ctx
+    return mp.get_context('spawn')
+
+class BacktestPool:
+    """
+    Fixed set of single-process workers for CPU-bound backtests. A run goes to the worker picked
+    by its code hash, so repeats of one strategy (parameter sweeps) hit that worker's caches.
+    """
+    def __init__(self, workers: int = BACKTEST_WORKERS):
+        ctx = _mp_context()
+        self._executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=backtest_worker.init_worker)
+            for _ in range(workers)
+        ]
+
+    def submit(self, data_list: list, strategy_code: str, strategy_params: dict):
+        key = hashlib.blake2b(strategy_code.encode('utf-8'), digest_size=8).digest()
+        executor = self._executors[int.from_bytes(key, 'little') % len(self._executors)]
+        return executor.submit(backtest_worker.run_backtest, data_list, strategy_code, strategy_params)
+
+    def shutdown(self, wait: bool = True):
+        for executor in self._executors:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+# Owned by the app: started/stopped by main.py's startup/shutdown hooks (no workers leak on reload)
+_POOL: Optional[BacktestPool] = None
+
+def start_backtest_pool(workers: int = BACKTEST_WORKERS):
+    global _POOL
+    if _POOL is None:
+        _POOL = BacktestPool(workers)
+
+def shutdown_backtest_pool():
+    global _POOL
+    pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown()
+
 class BacktestResult:
     def __init__(self):
         self.log = []
@@ -20,12 +132,33 @@ class BacktestResult:
         self.final_value = 0
         self.win_rate = 0.0
 
+class BoundedLog(TextIOBase):
+    """stdout sink that keeps only the most recent writes, so long runs can't grow it unbounded."""
+    def __init__(self, maxlen: int = 10_000):
+        self._chunks = deque(maxlen=maxlen)
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        self._chunks.append(s)
+        return len(s)
+
+    def getvalue(self) -> str:
+        return ''.join(self._chunks)
+
 class Backtester:
     def __init__(self, data_list: list, strategy_code: str, strategy_params: dict = None):
         self.data_list = data_list
         self.strategy_code = strategy_code
         self.strategy_params = strategy_params or {}
         
+    async def run_async(self):
+        """Run the backtest in the worker pool (or a thread if no pool was started) without blocking the event loop."""
+        if _POOL is None:
+            return await asyncio.to_thread(self.run)
+        return await asyncio.wrap_future(_POOL.submit(self.data_list, self.strategy_code, self.strategy_params))
+
     def run(self):
         cerebro = bt.Cerebro()
         
@@ -33,14 +166,19 @@ class Backtester:
         if not self.data_list:
             raise ValueError("No data provided for backtest")
             
-        df = pd.DataFrame(self.data_list)
-        
+        # Fill typed column buffers directly instead of letting pandas introspect N dicts
+        n = len(self.data_list)
+        rows = self.data_list
+        t = np.fromiter((d['time'] for d in rows), dtype=np.int64, count=n)
+        o = np.fromiter((d['open'] for d in rows), dtype=np.float64, count=n)
+        h = np.fromiter((d['high'] for d in rows), dtype=np.float64, count=n)
+        l = np.fromiter((d['low'] for d in rows), dtype=np.float64, count=n)
+        c = np.fromiter((d['close'] for d in rows), dtype=np.float64, count=n)
         # Ensure standard columns exist
-        if 'volume' not in df.columns:
-            df['volume'] = 0
-            
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        df.set_index('time', inplace=True)
+        v = np.fromiter((d.get('volume') or 0 for d in rows), dtype=np.float64, count=n)
+
+        # Same candles as a previous run -> reuse its DataFrame (feeds only read from it)
+        df = _get_frame(t, o, h, l, c, v)
         
         # Explicitly tell Backtrader to look for these columns
         # Note: PandasData uses None for datetime to use index
@@ -54,15 +192,19 @@ class Backtester:
             # Inject backtrader as 'bt'
             namespace['bt'] = bt
             
-            # Exec the class definition
-            exec(self.strategy_code, namespace)
+            # Exec the (cached) compiled class definition
+            code_obj, cls_name = _get_compiled(self.strategy_code)
+            exec(code_obj, namespace)
             
             # Find the strategy class (assuming it inherits from bt.Strategy)
-            StrategyClass = None
-            for name, obj in namespace.items():
-                if isinstance(obj, type) and issubclass(obj, bt.Strategy) and obj is not bt.Strategy:
-                    StrategyClass = obj
-                    break
+            StrategyClass = namespace.get(cls_name) if cls_name else None
+            if not (isinstance(StrategyClass, type) and issubclass(StrategyClass, bt.Strategy)):
+                # Indirect subclasses aren't visible to the AST check; fall back to a scan
+                StrategyClass = None
+                for name, obj in namespace.items():
+                    if isinstance(obj, type) and issubclass(obj, bt.Strategy) and obj is not bt.Strategy:
+                        StrategyClass = obj
+                        break
             
             if not StrategyClass:
                 raise ValueError("No class inheriting from bt.Strategy found in code")
@@ -82,13 +224,11 @@ class Backtester:
         # 4. Run
         logger.info("Starting Backtest...")
         try:
-            # Capture stdout
-            old_stdout = sys.stdout
-            sys.stdout = mystdout = StringIO()
-            
-            strats = cerebro.run()
+            # Capture stdout (restored even if the strategy raises), keeping only the tail
+            mystdout = BoundedLog()
+            with redirect_stdout(mystdout):
+                strats = cerebro.run()
             
-            sys.stdout = old_stdout
             log_output = mystdout.getvalue()
             
             # 5. Extract Results
@@ -102,9 +242,11 @@ class Backtester:
                 figures = cerebro.plot(style='candlestick', barup='green', bardown='red')
                 if figures and figures[0]:
                     fig = figures[0][0]
+                    # Tight layout during the draw replaces bbox_inches='tight' (a second render pass)
+                    fig.set_tight_layout(True)
                     # Save to buffer
                     buf = BytesIO()
-                    fig.savefig(buf, format='png', bbox_inches='tight')
+                    FigureCanvasAgg(fig).print_png(buf)
                     buf.seek(0)
                     plot_image = base64.b64encode(buf.read()).decode('utf-8')
                     plt.close(fig)
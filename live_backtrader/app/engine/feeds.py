@@ -1,5 +1,6 @@
 import backtrader as bt
 from datetime import datetime
+from backtrader.utils import date2num
 
 class PandasData(bt.feeds.PandasData):
     """
@@ -15,6 +16,37 @@ class PandasData(bt.feeds.PandasData):
         ('openinterest', -1),
     )
 
+    def start(self):
+        super().start()
+        df = self.p.dataname
+        # Resolve the column mapping once: raw NumPy columns + target lines, indexed per bar
+        self._blocks = []
+        for field in self.getlinealiases():
+            if field == 'datetime':
+                continue
+            colindex = self._colmapping[field]
+            if colindex is None:
+                continue
+            self._blocks.append((getattr(self.lines, field), df.iloc[:, colindex].to_numpy()))
+        self._n = len(df)
+        self._dtnums = None
+        if self._colmapping['datetime'] is None:
+            # Same conversion Backtrader does per bar, done once up front
+            self._dtnums = [date2num(ts.to_pydatetime()) for ts in df.index]
+
+    def _load(self):
+        if self._dtnums is None:
+            # Datetime in a column instead of the index: use the generic loader
+            return super()._load()
+        self._idx += 1
+        i = self._idx
+        if i >= self._n:
+            return False
+        for line, values in self._blocks:
+            line[0] = values[i]
+        self.lines.datetime[0] = self._dtnums[i]
+        return True
+
 class DictListFeed(bt.feeds.PandasData):
     """
     Convert List of Dicts to DataFrame for Backtrader
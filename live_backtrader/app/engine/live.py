@@ -3,11 +3,25 @@ import os
 import threading
 import asyncio
 import json
+import math
+import operator
+import time
 import logging
 import collections
-from datetime import datetime, timedelta
+import dataclasses
+import functools
+import hashlib
+import numpy as np
+import orjson
+from datetime import datetime
+from types import CodeType
 from zoneinfo import ZoneInfo
 from app.core.asset_selector import get_best_forex_asset
+from app.core.session_manager import session_manager
+from app.data.aggregation_kernel import (
+    step_bar, fold_ticks, new_bar_state, new_closed_bar, signal_trades, BAR_STALE, BAR_UPDATED, BAR_CLOSED,
+    BAR_TIME, BAR_OPEN, BAR_HIGH, BAR_LOW, BAR_CLOSE, BAR_VOLUME,
+)
 
 # Ensure we can find the ChipaPocketOptionData module
 # Adjust this path based on where it actually is relative to this file
@@ -27,22 +41,141 @@ except ImportError:
         logging.error("Could not import ChipaPocketOptionData. Make sure it is in the path.")
         subscribe_symbol_timed = None
 
+# History lookups resolved once here, not on every (re)connect of the feed loop
+try:
+    from ChipaPocketOptionData import get_candles
+except ImportError:
+    get_candles = None
+
 try:
     from BinaryOptionsToolsV2.pocketoption import PocketOptionAsync
 except ImportError:
     PocketOptionAsync = None
     logging.warning("Could not import PocketOptionAsync from BinaryOptionsToolsV2. Real trading unavailable.")
 
+_SSID_PATHS = ("ssid.txt", os.path.join(workspace_root, "ssid.txt"), os.path.join(workspace_root, "live_backtrader", "ssid.txt"))
+_DEFAULT_SSID = '42["auth",{"session":"m9n4q60krjrojb1elm1g171tff","isDemo":1,"uid":120824712,"platform":2,"isFastHistory":true,"isOptimized":true}]'
+
+@functools.lru_cache(maxsize=1)
+def _load_ssid() -> str:
+    for p in _SSID_PATHS:
+        if os.path.exists(p):
+            with open(p, "r") as f: ssid = f.read().strip()
+            if ssid: return ssid
+    return _DEFAULT_SSID
+
+def _history_columns(history):
+    """history rows -> (time, open, high, low, close, volume) arrays, built once per fetch."""
+    n = len(history)
+    return (
+        np.fromiter((h['time'] for h in history), np.int64, n),
+        np.fromiter((h['open'] for h in history), np.float64, n),
+        np.fromiter((h['high'] for h in history), np.float64, n),
+        np.fromiter((h['low'] for h in history), np.float64, n),
+        np.fromiter((h['close'] for h in history), np.float64, n),
+        np.fromiter((h.get('volume') or 0 for h in history), np.float64, n),
+    )
+
+def _tick_columns(ticks):
+    """Buffered feed ticks -> (ts, open, high, low, close, volume) float64 arrays for fold_ticks."""
+    n = len(ticks)
+    return (
+        np.fromiter((int(t['timestamp']) for t in ticks), np.float64, n),
+        np.fromiter((t['open'] for t in ticks), np.float64, n),
+        np.fromiter((t['high'] for t in ticks), np.float64, n),
+        np.fromiter((t['low'] for t in ticks), np.float64, n),
+        np.fromiter((t['close'] for t in ticks), np.float64, n),
+        np.fromiter((t.get('volume') or 0 for t in ticks), np.float64, n),
+    )
+
 IST = ZoneInfo("Asia/Kolkata")
-UTC = ZoneInfo("UTC")
+
+def _ist_offset(ts):
+    # Seconds east of UTC in IST at epoch ts; looked up once per local day, not per tick
+    return int(datetime.fromtimestamp(ts, tz=IST).utcoffset().total_seconds())
+
+# User strategy code objects, keyed by source hash: asset switches/restarts reuse the bytecode
+_USER_CODE_CACHE: dict[bytes, CodeType] = {}
+_USER_CODE_CACHE_MAX = 64
+
+def _compile_user_code(code_str: str) -> CodeType:
+    key = hashlib.blake2b(code_str.encode('utf-8'), digest_size=16).digest()
+    code_obj = _USER_CODE_CACHE.get(key)
+    if code_obj is None:
+        code_obj = compile(code_str, "<user_strategy>", "exec")
+        if len(_USER_CODE_CACHE) >= _USER_CODE_CACHE_MAX:
+            _USER_CODE_CACHE.pop(next(iter(_USER_CODE_CACHE)))
+        _USER_CODE_CACHE[key] = code_obj
+    return code_obj
 
 logger = logging.getLogger("LiveEngine")
 
+CANDLE_EMIT_INTERVAL_NS = 100_000_000 # Developing-candle updates go out at most ~10x per second
+CATCHUP_MIN_TICKS = 32 # Queued ticks at which the loop folds the backlog in one pass (reconnect bursts)
+# Constant envelope of candle frames; only the data object is encoded per update
+_CANDLE_HDR = b'{"type":"candle","data":'
+_HISTORY_HDR = b'{"type":"history","data":'
+REAL_RESULT_BACKOFF = (1, 2, 4) # Seconds between check_win retries while a real trade is still pending
+ERROR_BACKOFF_MIN, ERROR_BACKOFF_MAX = 1.0, 30.0 # Feed retry delay after a runtime error, doubled per failure
+
+@dataclasses.dataclass(slots=True)
+class _Bar:
+    """Developing live candle; slotted attributes instead of a fresh 7-key dict per tick."""
+    time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+    def __getitem__(self, key):
+        # Dict-style reads for strategies written against candle dicts
+        return self.time if key == 'timestamp' else getattr(self, key)
+
+    @classmethod
+    def from_history(cls, h):
+        return cls(h['time'], h['open'], h['high'], h['low'], h['close'], h.get('volume', 0))
+
+    def load(self, time, open, high, low, close, volume):
+        # Refill in place: the built-in strategy never keeps the candle, so one record is reused
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        return self
+
+    @staticmethod
+    def dict_of(time, open, high, low, close, volume):
+        # Candle dict for user strategies, built straight from the fields (no _Bar in between)
+        return {
+            'time': time,
+            'open': open,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume,
+            'timestamp': time
+        }
+
+    def to_dict(self):
+        return _Bar.dict_of(self.time, self.open, self.high, self.low, self.close, self.volume)
+
+PAYOUT = 0.92 # 92% Payout
+# Trade result codes stored in LiveStrategyBase._result
+WIN, LOSS, DRAW = 1, 2, 3
+RESULT_NAMES = (None, 'WIN', 'LOSS', 'DRAW')
+
 class LiveStrategyBase:
     """
     Base class for Live Strategies. 
     Users should implement logic here.
     """
+    # True if next() builds state that must be replayed from history before going live.
+    # Stateless strategies skip warmup (trades/balance are reset after it anyway).
+    STATEFUL = False
+
     def __init__(self):
         self.balance = 1000.0
         self.base_bet = 1.0
@@ -51,10 +184,72 @@ class LiveStrategyBase:
         self.expiry = 60 # Default Expiry in seconds
         self.wins = 0
         self.losses = 0
-        self.trades = [] # List of active trades {entry_price, direction, amount, start_time, expiry_time}
-        self.signals = [] 
+        # Trades stored as parallel arrays (SoA) so expiry/PnL checks are vector ops
+        self._reset_trade_arrays()
+        self.signals = collections.deque(maxlen=10_000) # Bounded like completed_trades: engines run for hours
         self.on_signal = None  # Callback function(signal_data)
 
+    def _reset_trade_arrays(self, cap=64):
+        self._n = 0
+        self._head = 0 # First possibly-active slot; everything before it has settled
+        self.completed_trades = collections.deque(maxlen=500)
+        self._dir = np.empty(cap, np.int8) # 1 = CALL, -1 = PUT
+        self._entry = np.empty(cap, np.float64)
+        self._amount = np.empty(cap, np.float64)
+        self._start = np.empty(cap, np.float64)
+        self._expiry = np.empty(cap, np.float64)
+        self._active = np.zeros(cap, np.bool_)
+        self._result = np.zeros(cap, np.int8) # see RESULT_NAMES
+        self._exit = np.zeros(cap, np.float64)
+
+    _TRADE_FIELDS = ('_dir', '_entry', '_amount', '_start', '_expiry', '_active', '_result', '_exit')
+
+    def _grow_trade_arrays(self):
+        cap = len(self._dir) * 2
+        for name in self._TRADE_FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(cap, old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def _compact_trade_arrays(self):
+        # Settled trades live on in completed_trades; slide the open window back to slot 0
+        h, n = self._head, self._n
+        for name in self._TRADE_FIELDS:
+            arr = getattr(self, name)
+            arr[:n - h] = arr[h:n]
+        self._n = n - h
+        self._head = 0
+
+    def reset_trades(self):
+        self._reset_trade_arrays()
+
+    def has_active_trade(self):
+        # _head always rests on the oldest active trade (or _n when none are open)
+        return self._head < self._n
+
+    def _trade_dict(self, i):
+        result = RESULT_NAMES[self._result[i]]
+        trade = {
+            "direction": "CALL" if self._dir[i] > 0 else "PUT",
+            "entry_price": float(self._entry[i]),
+            "amount": float(self._amount[i]),
+            "start_time": self._start[i].item(),
+            "expiry_time": self._expiry[i].item(),
+            "active": bool(self._active[i])
+        }
+        if result:
+            trade['result'] = result
+            trade['profit'] = trade['amount'] * PAYOUT if result == 'WIN' else (-trade['amount'] if result == 'LOSS' else 0)
+            trade['exit_price'] = float(self._exit[i])
+        return trade
+
+    @property
+    def trades(self):
+        """Recent settled trades plus open ones, as dicts (the hot path works on the arrays)."""
+        open_trades = [self._trade_dict(i) for i in range(self._head, self._n) if self._active[i]]
+        return list(self.completed_trades) + open_trades
+
     def set_signal_callback(self, callback):
         self.on_signal = callback
 
@@ -62,6 +257,18 @@ class LiveStrategyBase:
         """Called every time a new candle arrives."""
         pass
 
+    def batch_signals(self, cols):
+        """
+        Signals for every history candle at once (+1 CALL, -1 PUT, 0 none) from the
+        (time, open, high, low, close, volume) columns, or None to replay through next().
+        """
+        return None
+
+    def warmup(self, candles):
+        """Feed history before going live. Override with a bulk version if next() is slow."""
+        for c in candles:
+            self.next(c)
+
     def buy(self, price, time):
         return self._place_trade("CALL", price, time)
 
@@ -69,15 +276,21 @@ class LiveStrategyBase:
         return self._place_trade("PUT", price, time)
     
     def _place_trade(self, direction, price, time):
-        trade = {
-            "direction": direction,
-            "entry_price": price,
-            "amount": self.current_bet,
-            "start_time": time,
-            "expiry_time": time + self.expiry,
-            "active": True
-        }
-        self.trades.append(trade)
+        if self._n == len(self._dir):
+            # Reuse settled slots first; only grow when every slot holds an open trade
+            if self._head > 0:
+                self._compact_trade_arrays()
+            else:
+                self._grow_trade_arrays()
+        i = self._n
+        self._dir[i] = 1 if direction == "CALL" else -1
+        self._entry[i] = price
+        self._amount[i] = self.current_bet
+        self._start[i] = time
+        self._expiry[i] = time + self.expiry
+        self._active[i] = True
+        self._result[i] = 0
+        self._n = i + 1
         
         # Emit Signal
         if self.on_signal:
@@ -88,49 +301,49 @@ class LiveStrategyBase:
                 "expiry": self.expiry
             })
             
-        return trade
+        return self._trade_dict(i)
 
     def update_trades(self, current_price, current_time):
         """
         Simulate trade expiry. 
         Checks if current_time >= trade.expiry_time
         """
+        # Only the open window [_head, _n) is scanned, not every trade ever placed
+        h, n = self._head, self._n
+        if h == n:
+            return []
+        expired = self._active[h:n] & (self._expiry[h:n] <= current_time)
+        if not expired.any():
+            return []
+
+        # Sign of the move in the trade's direction: >0 win, 0 draw, <0 loss
+        idx = h + np.flatnonzero(expired)
+        move = np.sign((current_price - self._entry[idx]) * self._dir[idx])
+        self._result[idx] = np.where(move > 0, WIN, np.where(move < 0, LOSS, DRAW))
+        self._exit[idx] = current_price
+        self._active[idx] = False
+
+        # Expiry is constant, so trades settle in FIFO order and the head just moves forward
+        still_open = np.flatnonzero(self._active[h:n])
+        self._head = h + int(still_open[0]) if still_open.size else n
+
+        # Only the few expired trades need dicts; apply in order since on_win reads the balance
         completed = []
-        for trade in self.trades:
-            if not trade['active']: continue
-            
-            # Expiry Check
-            if current_time >= trade['expiry_time']:
-                result = 'LOSS'
-                if trade['direction'] == 'CALL':
-                    if current_price > trade['entry_price']:
-                        result = 'WIN'
-                    elif current_price == trade['entry_price']:
-                        result = 'DRAW'
-                elif trade['direction'] == 'PUT':
-                    if current_price < trade['entry_price']:
-                         result = 'WIN'
-                    elif current_price == trade['entry_price']:
-                         result = 'DRAW'
-                
-                profit = 0
-                if result == 'WIN':
-                    profit = trade['amount'] * 0.92 # 92% Payout
-                    self.balance += profit
-                    self.wins += 1
-                    self.on_win(trade)
-                elif result == 'LOSS':
-                    self.balance -= trade['amount']
-                    self.losses += 1
-                    self.on_loss(trade)
-                elif result == 'DRAW':
-                    self.on_draw(trade)
-                
-                trade['active'] = False
-                trade['result'] = result
-                trade['profit'] = profit if result == 'WIN' else (-trade['amount'] if result == 'LOSS' else 0)
-                trade['exit_price'] = current_price
-                completed.append(trade)
+        for i in idx:
+            trade = self._trade_dict(i)
+            result = trade['result']
+            if result == 'WIN':
+                self.balance += trade['profit']
+                self.wins += 1
+                self.on_win(trade)
+            elif result == 'LOSS':
+                self.balance -= trade['amount']
+                self.losses += 1
+                self.on_loss(trade)
+            else:
+                self.on_draw(trade)
+            completed.append(trade)
+        self.completed_trades.extend(completed)
         return completed
 
     def on_win(self, trade):
@@ -146,19 +359,32 @@ class LiveStrategyBase:
         pass
 
 class MyLiveStrategy(LiveStrategyBase):
+    def __init__(self):
+        super().__init__()
+        # Bound once; next() runs on every closed candle. Indexed by sign(close - open) + 1
+        self._by_sign = (self.sell, None, self.buy)
+
     def next(self, candle):
-        if any(t['active'] for t in self.trades):
+        # candle is a _Bar (the engine only hands dicts to user strategies)
+        if self.has_active_trade():
             return
 
         # Default strategy logic: Simple random 50/50 for testing
         # Or simple strategy: Buy if close > open (Green), Sell if close < open (Red)
-        if candle['close'] > candle['open']:
-            self.buy(candle['close'], candle['time'])
-        elif candle['close'] < candle['open']:
-            self.sell(candle['close'], candle['time'])
+        close = candle.close
+        open_ = candle.open
+        place = self._by_sign[(close > open_) - (close < open_) + 1]
+        if place is not None:
+            place(close, candle.time)
+
+    def batch_signals(self, cols):
+        # Same green/red rule over the whole history
+        return np.sign(cols[4] - cols[1]).astype(np.int8)
 
 # --- DYNAMIC STRATEGY ---
 class DynamicStrategy(LiveStrategyBase):
+    STATEFUL = True # Arbitrary user code: assume indicators/state
+
     def __init__(self, code_str, risk_percent, martingale_multiplier, initial_balance=1000.0):
         super().__init__()
         self.code_str = code_str
@@ -170,45 +396,41 @@ class DynamicStrategy(LiveStrategyBase):
         
         # Compile user code
         # We expect a class "MyStrategy" with a "next" method or similar simple function
-        # For simplicity, let's wrap the code in a local scope
-        self.user_scope = {}
+        # Run it in ONE globals dict: module-level code (fast LOAD_GLOBAL/STORE_GLOBAL),
+        # and imports made by the user code stay visible inside their methods
+        self.user_scope = {'np': np, 'numpy': np}
         
         # Inject common libraries
-        user_globals = {}
-        try:
-            import numpy as np
-            user_globals['np'] = np
-            user_globals['numpy'] = np
-        except ImportError: pass
-        
         try:
             import pandas as pd
-            user_globals['pd'] = pd
-            user_globals['pandas'] = pd
+            self.user_scope['pd'] = pd
+            self.user_scope['pandas'] = pd
         except ImportError: pass
 
+        self._user_next = None
         try:
-            exec(code_str, user_globals, self.user_scope)
+            exec(_compile_user_code(code_str), self.user_scope)
             self.user_class = self.user_scope.get('MyStrategy')()
+            self._user_next = self.user_class.next # Bound once, not looked up per candle
         except Exception as e:
             print(f"Strategy Compilation Error: {e}")
             self.user_class = None
 
     def next(self, candle):
         # Mandatory: Wait for previous trade result
-        if any(t['active'] for t in self.trades):
+        if self.has_active_trade():
             return
 
-        if not self.user_class: return
+        user_next = self._user_next
+        if user_next is None: return
         
+        # Re-calculate base bet based on new balance if needed?
+        # User said: "place 1% of the trading fund as base amount"
+        # Usually strict martingale keeps base static until full reset.
+        # But "1% of trading fund" implies dynamic sizing.
+        # Let's keep base bet dynamic based on current balance ONLY on reset.
         try:
-            # Re-calculate base bet based on new balance if needed?
-            # User said: "place 1% of the trading fund as base amount"
-            # Usually strict martingale keeps base static until full reset.
-            # But "1% of trading fund" implies dynamic sizing.
-            # Let's keep base bet dynamic based on current balance ONLY on reset.
-            
-            signal = self.user_class.next(candle)
+            signal = user_next(candle)
             
             if signal == "CALL":
                 self.buy(candle['close'], candle['time'])
@@ -218,6 +440,33 @@ class DynamicStrategy(LiveStrategyBase):
         except Exception as e:
             print(f"Strategy Execution Error: {e}")
 
+    def batch_signals(self, cols):
+        # Opt-in: a user MyStrategy.signals(times, opens, highs, lows, closes, volumes) returning one
+        # value per candle (NumPy, or a numba @njit helper) lets SIMULATION skip the per-candle next().
+        # Plain @njit there: cache=True needs a source file, and user code is exec'd from a string
+        bulk = getattr(self.user_class, 'signals', None)
+        if bulk is None:
+            return None
+        try:
+            signals = np.asarray(bulk(*cols), dtype=np.int8)
+            if signals.shape != cols[0].shape:
+                raise ValueError(f"expected {cols[0].shape[0]} signals, got shape {signals.shape}")
+            return signals
+        except Exception as e:
+            print(f"Strategy Signals Error: {e}")
+            return None
+
+    def warmup(self, candles):
+        # A user MyStrategy may take the whole history at once (e.g. vectorized indicators)
+        bulk = getattr(self.user_class, 'warmup', None)
+        if bulk is not None:
+            try:
+                bulk(candles)
+            except Exception as e:
+                print(f"Strategy Warmup Error: {e}")
+            return
+        super().warmup(candles)
+
     def on_win(self, trade):
         # Reset to Base Amount (1% of NEW balance)
         self.base_bet = self.balance * (self.risk_percent / 100.0)
@@ -228,13 +477,37 @@ class DynamicStrategy(LiveStrategyBase):
         self.current_bet *= self.martingale_factor
 
 class LiveEngine:
-    def __init__(self, callback):
+    def __init__(self, callback, raw_callback=None):
         self.running = False
         self.callback = callback # Async function
-        self.thread = None
+        self.raw_callback = raw_callback # Async function taking an already-encoded JSON frame (bytes)
+        self.task = None # Engine coroutine on the main loop
+        self._trade_tasks = set() # Strong refs so fire-and-forget monitor tasks aren't GC'd
+        self._trade_queue = None # (direction, amount, asset, duration) orders for _trade_worker
+        self._trade_worker_task = None # Started on the first forward test, then kept across start/stop
+        self._loop_thread_id = None # threading.get_ident() of the thread running _main_loop
+        self.skip_real_trades = False # Set while history is replayed so warmup signals never reach the broker
+        self.trader = None
+        self._api_style = None # 'callput' or 'buysell', detected once per trader
+        self._dir_fn = {} # {'CALL': fn, 'PUT': fn} bound once the trader exists
         self.strategy = None
         self.mode = "FORWARD_TEST"
-        self.logs = collections.deque(maxlen=50) # Keep persistent logs
+        self._logs_json = collections.deque(maxlen=50) # Keep persistent logs, as encoded log frames
+        self._logs_snapshot = None # (decoded tuple, joined bytes) of _logs_json; dropped when a log is added
+        self._pending_logs = collections.deque(maxlen=256) # Log frames held back until the next candle close
+        self._batch_logs = False # True while the feed loop is streaming and flushes per candle
+        self._tick_queue = None # asyncio.Queue the feed pump thread fills with raw ticks
+        self._pending_candle = False # _candle_data holds an update not yet sent (encoded only when it is)
+        self._sent_candle = None # Last candle frame actually sent (identical repeats are skipped)
+        self._candle_timer = None # call_later handle that flushes a held update at the end of its window
+        # Reused payload dicts: fields are overwritten and encoded immediately, never handed off
+        self._candle_data = {"time": 0, "open": 0.0, "high": 0.0, "low": 0.0, "close": 0.0, "dateStr": ""}
+        self._stats_msg = {"type": "stats", "balance": 0.0, "winRate": 0, "totalTrades": 0, "currentBet": 0.0}
+        self._last_emit_ns = 0
+        self._stats_sig = None # (balance, wins, losses, current_bet) behind the last stats frame
+        self._stats_frame = None # Last stats frame sent; replayed to clients that connect mid-session
+        self._stop_event = asyncio.Event() # Set by stop(): cuts an error backoff short
+        self._backoff = ERROR_BACKOFF_MIN # Next error backoff; reset once a feed delivers ticks again
         self.config = {}
         
         # Auto Asset Selection
@@ -287,9 +560,31 @@ class LiveEngine:
             "type": "state",
             "running": self.running,
             "config": self.config,
-            "logs": list(self.logs)
+            "logs": self.logs
         }
+
+    def _logs_view(self):
+        # Built once per change to the log ring, then shared by every state request until the next log
+        snap = self._logs_snapshot
+        if snap is None:
+            entries = tuple(self._logs_json)
+            snap = self._logs_snapshot = (tuple(orjson.loads(e) for e in entries), b",".join(entries))
+        return snap
+
+    @property
+    def logs(self):
+        # Dict view for callers that want objects; the engine itself only keeps the bytes
+        return self._logs_view()[0]
+
+    def get_state_json(self) -> bytes:
+        """get_state() as JSON bytes, splicing in the pre-encoded log entries."""
+        head = orjson.dumps({"type": "state", "running": self.running, "config": self.config})
+        return head[:-1] + b',"logs":[' + self._logs_view()[1] + b"]}"
     
+    def get_stats_json(self):
+        """Last stats frame (JSON bytes) of this session, or None before the first candle close."""
+        return self._stats_frame
+
     def start(self, asset="EURUSD_otc", timeframe=5, expiry=60, mode="FORWARD_TEST", code=None, risk_percent=1.0, martingale_multiplier=2.0):
         if self.running: return
         
@@ -317,15 +612,140 @@ class LiveEngine:
         }
         
         self.running = True
-        self.thread = threading.Thread(target=self._run_loop, daemon=True)
-        self.thread.start()
+        self._stop_event.clear()
+        self._backoff = ERROR_BACKOFF_MIN
+        self._stats_sig = self._stats_frame = None # First close of the new session always reports
+        # Everything runs as coroutines on the server loop; only blocking library calls go to threads
+        self.task = self._main_loop.create_task(self._run())
         
     def stop(self):
+        # The feed loop sees the flag right away (woken by a None tick) and exits through its cleanup
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=2)
+        self._stop_event.set()
+        if self._tick_queue is not None:
+            self._tick_queue.put_nowait(None)
+        if self._trade_queue is not None:
+            # Orders not yet sent belong to the stopped session; the worker itself stays for the next start
+            dropped = 0
+            while not self._trade_queue.empty():
+                self._trade_queue.get_nowait()
+                dropped += 1
+            if dropped:
+                self._emit_log(f" >> {dropped} queued real trade(s) dropped on stop", "text-yellow-500")
+            
+    def _resolve_trader_methods(self):
+        # Pick call/put vs buy/sell once per trader instead of hasattr on every trade
+        # Each direction falls back on its own, so a client exposing only call() still works
+        trader = self.trader
+        call_fn = getattr(trader, 'call', None)
+        put_fn = getattr(trader, 'put', None)
+        self._api_style = 'callput' if call_fn and put_fn else 'buysell'
+        self._dir_fn = {'CALL': call_fn or trader.buy, 'PUT': put_fn or trader.sell}
+        self._emit_log(f"Trader API: {self._api_style}", "text-slate-500")
+
+    def _place_trade_publish(self, direction, price, time):
+        # Call original to keep Sim stats updated
+        trade = LiveStrategyBase._place_trade(self.strategy, direction, price, time)
+        # Log Real Trade attempt
+        self._emit_log(f"*** REAL TRADE: {direction} ${self.strategy.current_bet} @ {price} ***", "text-orange-400 font-bold")
+        # Here we would call the actual API: client.buy(...)
+        return trade
+
+    def _place_trade_forward(self, direction, price, time):
+        # 1. Internal Sim
+        t = LiveStrategyBase._place_trade(self.strategy, direction, price, time)
+        
+        # SAFETY: Do NOT execute real trades during WARMUP (History Loading)
+        if self.skip_real_trades:
+             return t
+
+        # 2. Real Execution: hand the order to the trade worker (no task/future per signal)
+        queue = self._trade_queue
+        if queue is not None:
+            # Stake read off the trade just booked instead of another self.strategy.current_bet chain
+            order = (direction, t["amount"], self.asset, self.expiry)
+            if threading.get_ident() == self._loop_thread_id:
+                queue.put_nowait(order)
+            else:
+                # Booked from a replay worker thread: asyncio.Queue is only safe on its own loop
+                self._main_loop.call_soon_threadsafe(queue.put_nowait, order)
+        return t
+
+    def _ensure_trade_worker(self):
+        # One queue + consumer per engine, reused by every forward-test run
+        if self._trade_worker_task is None or self._trade_worker_task.done():
+            self._trade_queue = asyncio.Queue()
+            self._trade_worker_task = self._main_loop.create_task(self._trade_worker(self._trade_queue))
+
+    async def _trade_worker(self, queue):
+        # Single consumer: orders go out in signal order; each placed trade is monitored alongside
+        while True:
+            order = await queue.get()
+            await self._execute_real_trade(*order)
+
+    async def _execute_real_trade(self, direction, amount, asset_name, duration):
+        # Check if trader is ready
+        place = self._dir_fn.get(direction)
+        if place is None:
+            self._emit_log(" >> Real Trade Skipped: Trader not initialized.", "text-yellow-500")
+            return
+        
+        try:
+            # Ensure valid balance before trading? (Optional, maybe assume if trader object exists it's ok)
+            # We can just try-catch the trade
             
-    def _run_loop(self):
+            self._emit_log(f" >> PLACING REAL TRADE: {direction} ${amount} ({duration}s)", "text-orange-400 font-bold")
+            
+            trade_result = await place(asset_name, amount, duration, check_win=False)
+                
+            if trade_result:
+                # API generally returns (trade_id, info) OR just info if it failed? 
+                # BinaryOptionsToolsV2 usually returns (id, bool/dict)
+                # Let's handle tuple unpacking carefully
+                trade_id = None
+                if isinstance(trade_result, tuple):
+                    trade_id = trade_result[0]
+                elif isinstance(trade_result, (str, int)):
+                    trade_id = trade_result
+                    
+                if trade_id:
+                    self._emit_log(f" >> Trade Placed. ID: {trade_id}", "text-emerald-400")
+                    
+                    # Nothing to do until expiry: a timer, not a sleeping task, holds the trade meanwhile
+                    self._main_loop.call_later(duration + 1.5, self._check_real_trade, trade_id, 0)
+                else:
+                     self._emit_log(f" >> Trade placement invalid result: {trade_result}", "text-red-400")
+            else:
+                self._emit_log(" >> Trade Placement Failed (None Result)", "text-red-400")
+
+        except Exception as e:
+            self._emit_log(f" >> Trade Logic Error: {e}", "text-red-500")
+
+    def _check_real_trade(self, trade_id, attempt):
+        # Timer callback: run one check_win as a short task
+        task = self._main_loop.create_task(self._finalize_real_trade(trade_id, attempt))
+        self._trade_tasks.add(task)
+        task.add_done_callback(self._trade_tasks.discard)
+
+    async def _finalize_real_trade(self, trade_id, attempt):
+        win_res = {'result': 'unknown'}
+        try:
+            win_res = await self.trader.check_win(trade_id)
+            print(win_res)
+        except: pass
+        
+        final_status = win_res.get('result', 'unknown')
+        if final_status not in ('win', 'loss') and attempt < len(REAL_RESULT_BACKOFF):
+            # Still pending: ask again after 1s, 2s, 4s
+            self._main_loop.call_later(REAL_RESULT_BACKOFF[attempt], self._check_real_trade, trade_id, attempt + 1)
+            return
+        
+        profit = win_res.get('profit', 0)
+        color = "text-emerald-400" if final_status == 'win' else "text-rose-400"
+        self._emit_log(f" >> REAL RESULT: {final_status.upper()} (${profit})", color)
+
+    async def _run(self):
+        self._loop_thread_id = threading.get_ident() # We are on the main loop's thread here
         if subscribe_symbol_timed is None:
             self._emit_log("Error: ChipaPocketOptionData library not found.", "text-red-500")
             return
@@ -338,52 +758,33 @@ class LiveEngine:
             self.strategy = MyLiveStrategy() # Fallback
             self._emit_log("Forward Test Started with Default Strategy", "text-blue-400")
         
+        # Built-in strategies take _Bar records; user code gets real dicts
+        wants_dict = isinstance(self.strategy, DynamicStrategy)
+
         # Configure Strategy Expiry & Hook
         self.strategy.expiry = self.expiry
         self.strategy.set_signal_callback(self._on_strategy_signal)
         
-        # Override _place_trade method if in Publish Mode
+        # Override _place_trade method if in Publish Mode (engine method, no per-trade closure)
         if self.mode == "PUBLISH":
-             original_place_trade = self.strategy._place_trade
-             def publish_trade_wrapper(direction, price, time):
-                 # Call original to keep Sim stats updated
-                 trade = original_place_trade(direction, price, time)
-                 # Log Real Trade attempt
-                 self._emit_log(f"*** REAL TRADE: {direction} ${self.strategy.current_bet} @ {price} ***", "text-orange-400 font-bold")
-                 # Here we would call the actual API: client.buy(...)
-                 return trade
-             self.strategy._place_trade = publish_trade_wrapper
+             self.strategy._place_trade = self._place_trade_publish
 
         self._emit_log(f"Config: {self.mode}, {self.timeframe}s Bar, {self.expiry}s Expiry", "text-slate-400")
 
-        # Load SSID (omitted for brevity, assume same logic as before or simplified)
-        ssid = None 
-        # ... (Include existing SSID loading logic here or assume it's set) ...
-        # For brevity in this diff, I'm just reusing the file reading logic quickly:
-        possible_paths = ["ssid.txt", os.path.join(workspace_root, "ssid.txt"), os.path.join(workspace_root, "live_backtrader", "ssid.txt")]
-        for p in possible_paths:
-            if os.path.exists(p):
-                with open(p, "r") as f: ssid = f.read().strip()
-                if ssid: break
-        if not ssid: ssid = '42["auth",{"session":"m9n4q60krjrojb1elm1g171tff","isDemo":1,"uid":120824712,"platform":2,"isFastHistory":true,"isOptimized":true}]'
+        # Load SSID: the in-memory session copy (kept current by /account/ssid), else the files probed once
+        ssid = session_manager.get_ssid() or _load_ssid()
 
         ssids = [ssid]
         
-        # --- DEDICATED LOOP FOR REAL TRADING ---
-        # We need a running loop to execute async broker methods.
-        # The main thread is blocked by the candle generator loop most of the time.
-        self.real_trade_loop = asyncio.new_event_loop()
-        t_trade_loop = threading.Thread(target=self.real_trade_loop.run_forever, daemon=True)
-        t_trade_loop.start()
-        self._emit_log("Started Real Trading Logic Thread", "text-slate-500")
-
         # --- FORWARD TEST TRADING SETUP ---
         if self.mode == "FORWARD_TEST" and PocketOptionAsync:
              self._emit_log("Initializing Real Trader for Forward Test...", "text-blue-400")
              
              async def _init_trader_async():
                  try:
-                     self.trader = PocketOptionAsync(ssid)
+                     # Constructor may block; build it off-loop like the API's client cache does
+                     self.trader = await asyncio.to_thread(PocketOptionAsync, ssid)
+                     self._resolve_trader_methods()
                      # Retry loop for balance to ensure valid connection
                      for i in range(10):  # Retry for up to 20 seconds
                         try:
@@ -404,181 +805,93 @@ class LiveEngine:
                      return False
 
              # Run Init
-             future = asyncio.run_coroutine_threadsafe(_init_trader_async(), self.real_trade_loop)
+             init_task = asyncio.create_task(_init_trader_async())
              try:
-                 # Wait for init
-                 future.result(timeout=10)
+                 # Wait for init (shielded: on timeout it keeps connecting in the background)
+                 await asyncio.wait_for(asyncio.shield(init_task), timeout=10)
              except Exception as e:
                  self._emit_log(f"Real Trader Init Timed Out/Failed: {e}", "text-red-500")
                  # Proceed anyway, but the trader might not be ready yet.
              
-             # Override _place_trade (ALWAYS, so we can trade when it connects later)
-             original_place_trade = self.strategy._place_trade
+             # Real orders flow through one queue + worker coroutine on this loop
+             self._ensure_trade_worker()
              
-             def forward_trade_wrapper(direction, price, time):
-                 # 1. Internal Sim
-                 t = original_place_trade(direction, price, time)
-                 
-                 # SAFETY: Do NOT execute real trades during WARMUP (History Loading)
-                 if getattr(self, 'skip_real_trades', False):
-                      return t
-
-                 # 2. Real Execution
-                 amount = self.strategy.current_bet
-                 asset_name = self.asset
-                 duration = self.expiry
-                 
-                 async def execute_real_trade():
-                     # Check if trader is ready
-                     if not hasattr(self, 'trader') or not self.trader: 
-                         self._emit_log(" >> Real Trade Skipped: Trader not initialized.", "text-yellow-500")
-                         return
-                     
-                     try:
-                         # Ensure valid balance before trading? (Optional, maybe assume if trader object exists it's ok)
-                         # We can just try-catch the trade
-                         
-                         action = direction.lower()
-                         self._emit_log(f" >> PLACING REAL TRADE: {action.upper()} ${amount} ({duration}s)", "text-orange-400 font-bold")
-                         
-                         trade_result = None
-                         if action == 'call':
-                             if hasattr(self.trader, 'call'):
-                                 trade_result = await self.trader.call(asset_name, amount, duration, check_win=False)
-                             else:
-                                 trade_result = await self.trader.buy(asset_name, amount, duration, check_win=False)
-                         elif action == 'put':
-                             if hasattr(self.trader, 'put'):
-                                 trade_result = await self.trader.put(asset_name, amount, duration, check_win=False)
-                             else:
-                                 trade_result = await self.trader.sell(asset_name, amount, duration, check_win=False)
-                             
-                         if trade_result:
-                             # API generally returns (trade_id, info) OR just info if it failed? 
-                             # BinaryOptionsToolsV2 usually returns (id, bool/dict)
-                             # Let's handle tuple unpacking carefully
-                             trade_id = None
-                             if isinstance(trade_result, tuple):
-                                 trade_id = trade_result[0]
-                             elif isinstance(trade_result, (str, int)):
-                                 trade_id = trade_result
-                                 
-                             if trade_id:
-                                 self._emit_log(f" >> Trade Placed. ID: {trade_id}", "text-emerald-400")
-                                 
-                                 # Monitor
-                                 await asyncio.sleep(duration + 2)
-                                 
-                                 win_res = {'result': 'unknown'}
-                                 for _ in range(5):
-                                     try:
-                                         win_res = await self.trader.check_win(trade_id)
-                                         print(win_res)
-                                         if win_res.get('result') in ['win', 'loss']:
-                                              break
-                                     except: pass
-                                     await asyncio.sleep(2)
-                                 
-                                 final_status = win_res.get('result', 'unknown')
-                                 profit = win_res.get('profit', 0)
-                                 color = "text-emerald-400" if final_status == 'win' else "text-rose-400"
-                                 self._emit_log(f" >> REAL RESULT: {final_status.upper()} (${profit})", color)
-                             else:
-                                  self._emit_log(f" >> Trade placement invalid result: {trade_result}", "text-red-400")
-                         else:
-                             self._emit_log(" >> Trade Placement Failed (None Result)", "text-red-400")
-
-                     except Exception as e:
-                         self._emit_log(f" >> Trade Logic Error: {e}", "text-red-500")
-
-                 # Schedule on REAL TRADER loop
-                 asyncio.run_coroutine_threadsafe(execute_real_trade(), self.real_trade_loop)
-                 return t
-
-             self.strategy._place_trade = forward_trade_wrapper
+             # Override _place_trade (ALWAYS, so we can trade when it connects later)
+             self.strategy._place_trade = self._place_trade_forward
              self._emit_log("Real Trading Enabled (Async Hook).", "text-emerald-400")
 
-        loop = asyncio.new_event_loop()
-
-
-        asyncio.set_event_loop(loop)
-        
         # --- HISTORY FETCHING ---
         try:
-            from ChipaPocketOptionData import get_candles
+            if get_candles is None:
+                raise ImportError("get_candles")
             self._emit_log("Fetching last 1 hour history...", "text-blue-400")
-            history = get_candles(self.asset, self.timeframe, 3600, ssids)
+            history = await asyncio.to_thread(get_candles, self.asset, self.timeframe, 3600, ssids)
             
             if history:
-                 # Normalize Keys: Ensure 'time' exists
+                 # Normalize Keys (ensure 'time' exists) and drop malformed candles in one pass
+                 clean = []
+                 append = clean.append
                  for h in history:
-                     if 'time' not in h and 'timestamp' in h:
+                     if 'time' not in h:
+                         if 'timestamp' not in h: continue
                          h['time'] = h['timestamp']
+                     append(h)
+                 clean.sort(key=operator.itemgetter('time'))
+                 history = clean
                  
-                 # Filter out malformed candles
-                 history = [h for h in history if 'time' in h]
-                 history.sort(key=lambda x: x['time'])
+                 # Emit history to frontend: encoded here in one orjson call, so the frame holds no
+                 # reference to the dict rows once they are dropped below
+                 self._emit_raw(_HISTORY_HDR + orjson.dumps(history, option=orjson.OPT_SERIALIZE_NUMPY) + b"}")
                  
-                 # Emit history to frontend
-                 self._emit_data({
-                     "type": "history",
-                     "data": history
-                 })
+                 # Replays below read columns; the dict rows are only needed for the frontend
+                 cols = _history_columns(history)
+                 n_hist = len(history)
+                 del history
                  
                  # If SIMULATION MODE: The 'History' IS the test.
                  if self.mode == "SIMULATION":
-                      self._emit_log(f"Starting Simulation on {len(history)} candles...", "text-purple-400")
+                      self._emit_log(f"Starting Simulation on {n_hist} candles...", "text-purple-400")
                       
-                      for h_candle in history:
-                           if not self.running: break
-                           c = {
-                              'time': h_candle['time'],
-                              'open': h_candle['open'],
-                              'high': h_candle['high'],
-                              'low': h_candle['low'],
-                              'close': h_candle['close'],
-                              'volume': h_candle.get('volume', 0),
-                              'timestamp': h_candle['time']
-                           }
-                           # Update trades (simulate expiry for PREVIOUS trades)
-                           self.strategy.update_trades(c['close'], c['time'])
-                           # Execute Strategy
-                           self.strategy.next(c)
-                           # Small delay to visualize?
-                           pass 
+                      # User code runs per candle: replay on a worker thread so the server loop keeps
+                      # serving clients (and stop()) meanwhile
+                      strategy = self.strategy
+                      await asyncio.to_thread(self._replay_simulation, strategy, cols, wants_dict)
+                      if self.strategy is not strategy:
+                          return # Stopped and restarted mid-replay: the new session owns the engine
                       
                       self._emit_log("Simulation Complete.", "text-yellow-400")
                       self.running = False
                       return 
 
-                 # NORMAL MODES: Warmup
-                 self._emit_log(f"Warming up strategy with {len(history)} candles...", "text-purple-400")
-                 self.skip_real_trades = True # DISABLE Real Trading
-                 start_balance = self.strategy.balance
-                 self.strategy.set_signal_callback(None) # Disable live signals during warmup
-                 
-                 for h_candle in history:
-                      c = {
-                          'time': h_candle['time'],
-                          'open': h_candle['open'],
-                          'high': h_candle['high'],
-                          'low': h_candle['low'],
-                          'close': h_candle['close'],
-                          'volume': h_candle.get('volume', 0),
-                          'timestamp': h_candle['time']
-                      }
-                      self.strategy.next(c)
-                 
-                 # Re-enable signals
+                 # NORMAL MODES: Warmup (only strategies whose next() keeps state need the replay)
                  self.strategy.time_offset = 0
-                 self.strategy.set_signal_callback(self._on_strategy_signal)
-                 # Reset balance/stats
-                 self.strategy.balance = start_balance 
-                 self.strategy.trades = []
-                 self.strategy.wins = 0
-                 self.strategy.losses = 0
-                 self.skip_real_trades = False # ENABLE Real Trading
-                 self._emit_log("History processed. Strategy ready.", "text-emerald-400")
+                 if self.strategy.STATEFUL:
+                     self._emit_log(f"Warming up strategy with {n_hist} candles...", "text-purple-400")
+                     self.skip_real_trades = True # DISABLE Real Trading
+                     start_balance = self.strategy.balance
+                     self.strategy.set_signal_callback(None) # Disable live signals during warmup
+                     
+                     # Warmup may keep the candles, so each row gets its own record (one object, not two)
+                     make_candle = _Bar.dict_of if wants_dict else _Bar
+                     candles = [make_candle(*row) for row in zip(*(col.tolist() for col in cols))]
+                     # User warmup/next() may be slow: off the server loop like the simulation replay
+                     strategy = self.strategy
+                     await asyncio.to_thread(strategy.warmup, candles)
+                     del candles
+                     if self.strategy is not strategy:
+                         return # Stopped and restarted mid-warmup: the new session owns the engine
+                     
+                     # Re-enable signals
+                     self.strategy.set_signal_callback(self._on_strategy_signal)
+                     # Reset balance/stats
+                     self.strategy.balance = start_balance 
+                     self.strategy.reset_trades()
+                     self.strategy.wins = 0
+                     self.strategy.losses = 0
+                     self.skip_real_trades = False # ENABLE Real Trading
+                     self._emit_log("History processed. Strategy ready.", "text-emerald-400")
+                 else:
+                     self._emit_log("Stateless strategy: warmup skipped. Strategy ready.", "text-emerald-400")
 
         except ImportError:
             self._emit_log("Function 'get_candles' not found. Skipping history.", "text-orange-400")
@@ -600,175 +913,344 @@ class LiveEngine:
                 # Re-fetch history for new asset?
                 if self.mode != "SIMULATION": # Avoid disrupting simulation loop
                     try:
-                        from ChipaPocketOptionData import get_candles
+                        if get_candles is None:
+                            raise ImportError("get_candles")
                         # Just fetch small context (e.g. 50 candles) to warm up indicators
                         self._emit_log(f"Fetching context for {self.asset}...", "text-slate-500")
-                        history = get_candles(self.asset, self.timeframe, 300, ssids) 
+                        history = await asyncio.to_thread(get_candles, self.asset, self.timeframe, 300, ssids)
                         # ... logic to pump history into strategy ...
-                        if history and self.strategy:
+                        strategy = self.strategy
+                        if history and strategy:
                             # Pump into strategy without trading
                             self.skip_real_trades = True
-                            cb_backup = self.strategy.on_signal
-                            self.strategy.set_signal_callback(None)
-                            for h in history:
-                                if 'timestamp' in h: h['time'] = h['timestamp']
-                                if 'time' in h: 
-                                    self.strategy.next(h)
-                            self.strategy.set_signal_callback(cb_backup)
-                            self.skip_real_trades = False
+                            cb_backup = strategy.on_signal
+                            strategy.set_signal_callback(None)
+                            try:
+                                await asyncio.to_thread(self._replay_context, strategy, history, wants_dict)
+                            finally:
+                                strategy.set_signal_callback(cb_backup)
+                                self.skip_real_trades = False
                     except: pass
 
-                with subscribe_symbol_timed(self.asset, 1, ssids=ssids) as collector:
+                # The collector blocks on network reads: one pump thread iterates and closes it,
+                # handing ticks to this coroutine through an asyncio.Queue
+                feed = subscribe_symbol_timed(self.asset, 1, ssids=ssids)
+                collector = iter(await asyncio.to_thread(feed.__enter__))
+                ticks = self._tick_queue = asyncio.Queue()
+                pump_stop = threading.Event()
+                pump = asyncio.ensure_future(asyncio.to_thread(
+                    self._feed_pump, feed, collector, ticks, self._main_loop, pump_stop))
+                try:
                     self._emit_log("Data Feed Active. Aggregating candles...", "text-emerald-300")
+                    self._batch_logs = True
                     
                     time_offset = None
-                    current_candle = None
-                    last_processed_ts = 0
+                    local_offset = 0 # floor(time_offset) + IST offset, in seconds
+                    offset_day = None
+                    # Developing bar + last accepted ts live in a float64 state vector for step_bar
+                    bar = new_bar_state()
+                    closed = new_closed_bar()
+                    tf = float(self.timeframe)
                     
-                    for raw_candle in collector:
+                    # Per-tick names bound to locals once (LOAD_FAST instead of global/attribute lookups)
+                    next_tick = ticks.get
+                    queued = ticks.qsize
+                    step = step_bar
+                    gmtime = time.gmtime
+                    strftime = time.strftime
+                    monotonic_ns = time.monotonic_ns
+                    call_later = self._main_loop.call_later
+                    dumps = orjson.dumps
+                    np_opt = orjson.OPT_SERIALIZE_NUMPY
+                    data = self._candle_data
+                    strategy = self.strategy
+                    update_trades = strategy.update_trades
+                    strategy_next = strategy.next
+                    final_candle = _Bar(0, 0.0, 0.0, 0.0, 0.0, 0.0) # Refilled at every close
+                    emit_log = self._emit_log
+                    emit_raw = self._emit_raw
+                    flush_logs = self._flush_logs
+                    flush_candle = self._flush_pending_candle
+                    on_candle_timer = self._on_candle_timer
+                    stats_msg = self._stats_msg # Reused template, refilled at every close
+                    
+                    def bar_date(bar_time):
+                        # Plain integer shift + one gmtime call instead of datetime/tz objects
+                        nonlocal local_offset, offset_day
+                        local_ts = bar_time + local_offset
+                        if local_ts // 86400 != offset_day:
+                            # New local day (or first bar): refresh the tz offset in case of DST rules
+                            corrected_ts = math.floor(bar_time + time_offset)
+                            local_offset = math.floor(time_offset) + _ist_offset(corrected_ts)
+                            local_ts = bar_time + local_offset
+                            offset_day = local_ts // 86400
+                        return strftime("%Y-%m-%d %H:%M:%S", gmtime(local_ts))
+                    
+                    while True:
+                        raw_candle = await next_tick()
+                        if raw_candle is None: break
                         if not self.running: break
                         
                         raw_ts = int(raw_candle['timestamp'])
-                        raw_close = raw_candle['close']
-                        raw_vol = raw_candle.get('volume') or 0 
-                        
-                        # FILTER: Strict Time Ordering
-                        # Reject duplicate or late ticks to maintain deterministic state
-                        if raw_ts <= last_processed_ts:
+                        backlog = queued()
+                        catchup = backlog >= CATCHUP_MIN_TICKS
+                        if catchup:
+                            # Backfill burst (reconnect, stalled loop): fold all buffered ticks in one
+                            # compiled pass; only the finished bars go through the Python close logic
+                            burst = [raw_candle]
+                            for _ in range(backlog):
+                                item = ticks.get_nowait()
+                                if item is None:
+                                    ticks.put_nowait(None) # End of feed: seen by the next get
+                                    break
+                                burst.append(item)
+                            rows = np.empty((len(burst), 6), dtype=np.float64)
+                            n_closed, status = fold_ticks(bar, rows, *_tick_columns(burst), tf)
+                            closed_rows = rows[:n_closed].tolist()
+                        else:
+                            raw_vol = raw_candle.get('volume') or 0
+                            
+                            # FILTER (inside step_bar): Strict Time Ordering
+                            # Reject duplicate or late ticks to maintain deterministic state
+                            # Flooring to the bucket, OHLCV folding and boundary detection run compiled
+                            status = step(bar, closed, float(raw_ts), float(raw_candle['open']), float(raw_candle['high']),
+                                              float(raw_candle['low']), float(raw_candle['close']), float(raw_vol), tf)
+                            closed_rows = (closed,) if status == BAR_CLOSED else ()
+                        if status == BAR_STALE:
                             continue
-                        last_processed_ts = raw_ts
                         
                         # 1. Sync Time Offset (Once)
                         if time_offset is None:
-                            server_utc = datetime.fromtimestamp(raw_ts, tz=UTC)
-                            local_utc_now = datetime.now(tz=UTC)
-                            time_offset = (local_utc_now - server_utc).total_seconds()
-                            
-                        # 2. Determine Candle Bucket (Flooring)
-                        candle_start_time = (raw_ts // self.timeframe) * self.timeframe
-                        
-                        # 3. Handle Candle Logic
+                            # Plain float subtract: both sides are epoch seconds, no tz objects needed
+                            time_offset = time.time() - raw_ts
+                            offset_day = None
+                            self._backoff = ERROR_BACKOFF_MIN # The feed is healthy again
                         
-                        # Case A: Initialize First Candle
-                        if current_candle is None:
-                            current_candle = {
-                                'time': candle_start_time,
-                                'open': raw_candle['open'],
-                                'high': raw_candle['high'],
-                                'low': raw_candle['low'],
-                                'close': raw_close,
-                                'volume': raw_vol,
-                                'timestamp': candle_start_time
-                            }
-                        
-                        # Case B: New Candle Boundary Detected
-                        elif candle_start_time != current_candle['time']:
-                            # The bucket has changed. Finalize the OLD candle.
-                            final_candle = current_candle
+                        # New Candle Boundary Detected: the kernel copied each finished bar out of the state
+                        for row in closed_rows:
+                            if catchup:
+                                # Bars closed inside a burst never reached the template tick by tick
+                                data["time"] = int(row[BAR_TIME])
+                                data["open"] = row[BAR_OPEN]
+                                data["high"] = row[BAR_HIGH]
+                                data["low"] = row[BAR_LOW]
+                                data["close"] = row[BAR_CLOSE]
+                                data["dateStr"] = bar_date(data["time"])
+                                self._pending_candle = True
+                            # The closed bar's last throttled update must reach the chart first
+                            flush_candle()
+                            
+                            final_candle.load(int(row[BAR_TIME]), float(row[BAR_OPEN]), float(row[BAR_HIGH]),
+                                              float(row[BAR_LOW]), float(row[BAR_CLOSE]), float(row[BAR_VOLUME]))
                             
                             # --- STRATEGY EXECUTION (On Close) ---
-                            completed_trades = self.strategy.update_trades(final_candle['close'], final_candle['time'])
+                            completed_trades = update_trades(final_candle.close, final_candle.time)
                             
                             # Process Auto Switch Logic
                             if self.auto_select and completed_trades:
                                 for t in completed_trades:
                                     if t['result'] == 'LOSS':
                                         self.consecutive_losses += 1
-                                        self._emit_log(f"Loss #{self.consecutive_losses}", "text-rose-500")
+                                        emit_log(f"Loss #{self.consecutive_losses}", "text-rose-500")
                                         if self.consecutive_losses >= 4:
-                                                self._trigger_switch_asset()
+                                                # May re-rank assets (network): keep it off the event loop
+                                                await asyncio.to_thread(self._trigger_switch_asset)
                                     elif t['result'] == 'WIN':
                                         self.consecutive_losses = 0
                             
                             # Execute 'next' logic on the COMPLETED candle
-                            self.strategy.next(final_candle)
+                            strategy_next(final_candle.to_dict() if wants_dict else final_candle)
                             
                             # --- LOGGING & STATS ---
-                            ist_time = (datetime.fromtimestamp(final_candle['time'], tz=UTC) + timedelta(seconds=time_offset)).astimezone(IST)
-                            self._emit_log(f"Closed Candle: {final_candle['close']} @ {ist_time.strftime('%H:%M:%S')}", "text-slate-500")
-
-                            # Emit Stats (Balance, WinRate, etc.)
-                            stats = {
-                                "balance": self.strategy.balance,
-                                "winRate": 0,
-                                "totalTrades": self.strategy.wins + self.strategy.losses,
-                                "currentBet": self.strategy.current_bet
-                            }
-                            if stats['totalTrades'] > 0:
-                                stats['winRate'] = round((self.strategy.wins / stats['totalTrades']) * 100, 2)
-                            self._emit_data({"type": "stats", **stats})
+                            closed_str = strftime('%H:%M:%S', gmtime(final_candle.time + local_offset))
+                            emit_log(f"Closed Candle: {final_candle.close} @ {closed_str}", "text-slate-500")
+                            flush_logs()
                             
-                            # --- START NEW CANDLE ---
-                            current_candle = {
-                                'time': candle_start_time,
-                                'open': raw_candle['open'], 
-                                'high': raw_candle['high'],
-                                'low': raw_candle['low'],
-                                'close': raw_close,
-                                'volume': raw_vol,
-                                'timestamp': candle_start_time
-                            }
+                            # Emit Stats (Balance, WinRate, etc.) only when a trade changed them
+                            stats_sig = (strategy.balance, strategy.wins, strategy.losses, strategy.current_bet)
+                            if stats_sig != self._stats_sig:
+                                self._stats_sig = stats_sig
+                                stats = stats_msg
+                                stats['balance'] = strategy.balance
+                                stats['totalTrades'] = strategy.wins + strategy.losses
+                                stats['currentBet'] = strategy.current_bet
+                                stats['winRate'] = 0
+                                if stats['totalTrades'] > 0:
+                                    stats['winRate'] = round((strategy.wins / stats['totalTrades']) * 100, 2)
+                                self._stats_frame = dumps(stats, option=np_opt)
+                                emit_raw(self._stats_frame)
                             
-                        # Case C: Update Existing Candle
-                        else:
-                            current_candle['high'] = max(current_candle['high'], raw_candle['high'])
-                            current_candle['low'] = min(current_candle['low'], raw_candle['low'])
-                            current_candle['close'] = raw_close
-                            current_candle['volume'] += raw_vol
+                            if self.switch_asset_flag:
+                                break # Remaining burst bars belong to the asset being left
                         
                         # 4. Emit Real-Time Update
-                        server_utc = datetime.fromtimestamp(current_candle['time'], tz=UTC)
-                        corrected_utc = server_utc + timedelta(seconds=time_offset)
-                        time_str = corrected_utc.astimezone(IST).strftime("%Y-%m-%d %H:%M:%S")
+                        if status != BAR_UPDATED:
+                            # A bar just opened: its time, open and dateStr hold until the next boundary
+                            bar_time = int(bar[BAR_TIME])
+                            data["time"] = bar_time
+                            data["open"] = bar[BAR_OPEN]
+                            data["dateStr"] = bar_date(bar_time)
                         
-                        self._emit_data({
-                            "type": "candle",
-                            "data": {
-                                "time": current_candle["time"],
-                                "open": current_candle["open"],
-                                "high": current_candle["high"],
-                                "low": current_candle["low"],
-                                "close": current_candle["close"],
-                                "dateStr": time_str
-                            }
-                        })
+                        # Coalesce: keep only the newest payload, send when the interval passed or a bar just opened
+                        data["high"] = bar[BAR_HIGH]
+                        data["low"] = bar[BAR_LOW]
+                        data["close"] = bar[BAR_CLOSE]
+                        self._pending_candle = True
+                        now_ns = monotonic_ns()
+                        wait_ns = CANDLE_EMIT_INTERVAL_NS - (now_ns - self._last_emit_ns)
+                        if status == BAR_CLOSED or wait_ns <= 0:
+                            self._last_emit_ns = now_ns
+                            flush_candle()
+                        elif self._candle_timer is None:
+                            # Held update: send it when the window ends even if no further tick arrives
+                            self._candle_timer = call_later(wait_ns / 1e9, on_candle_timer)
 
                         # Check for Switch Flag inside the loop
                         if self.switch_asset_flag:
                             self.switch_asset_flag = False
-                            self._emit_log(f"Switching Asset Context now...", "text-yellow-500")
+                            emit_log(f"Switching Asset Context now...", "text-yellow-500")
                             break # Break inner loop to restart with new asset
+                finally:
+                    self._tick_queue = None
+                    self._batch_logs = False
+                    self._flush_logs()
+                    pump_stop.set()
+                    if self.running or pump.done():
+                        # Reconnecting: the old subscription must be closed first (also re-raises pump errors)
+                        await pump
+                    else:
+                        # Stopping: the pump closes the feed after its current read; don't block on it
+                        pump.add_done_callback(lambda t: t.cancelled() or t.exception())
 
             except Exception as e:
                 self._emit_log(f"Runtime Error: {e}", "text-red-500")
                 print(f"Error: {e}")
-                # Prevent rapid loop on error
-                import time
-                time.sleep(5)
+                # Prevent rapid loop on error: back off 1, 2, 4 ... 30s, but wake at once on stop()
+                delay = self._backoff
+                self._backoff = min(delay * 2, ERROR_BACKOFF_MAX)
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
                 
             finally:
+                # Don't leave the last throttled candle update behind
+                self._flush_pending_candle()
                 # Check if we should really stop or just restarting
                 if not self.running:
                     self._emit_log("Test Stopped.", "text-yellow-500")
-                    # Cleanup Trade Loop
-                    if hasattr(self, 'real_trade_loop') and self.real_trade_loop.is_running():
-                        self.real_trade_loop.call_soon_threadsafe(self.real_trade_loop.stop)
 
 
 
 
 
+    def _replaying(self, strategy):
+        # False once stop() ran or a newer session replaced the strategy
+        return self.running and self.strategy is strategy
+
+    def _replay_simulation(self, strategy, cols, wants_dict):
+        """SIMULATION replay of the history columns (worker thread)."""
+        signals = strategy.batch_signals(cols)
+        if signals is not None:
+            # Signals for all candles at once: entries/exits come from one compiled pass over
+            # the columns; Python only books the trades (bet sizing depends on prior results)
+            times, closes = cols[0], cols[4]
+            entries, exits, dirs = signal_trades(times, signals, strategy.expiry)
+            time_l, close_l = times.tolist(), closes.tolist()
+            place = strategy._place_trade
+            for e, x, d in zip(entries.tolist(), exits.tolist(), dirs.tolist()):
+                if not self._replaying(strategy): break
+                place("CALL" if d > 0 else "PUT", close_l[e], time_l[e])
+                if x >= 0:
+                    strategy.update_trades(close_l[x], time_l[x])
+            return
+
+        make_candle = _Bar.dict_of if wants_dict else _Bar(0, 0.0, 0.0, 0.0, 0.0, 0.0).load
+        for row in zip(*(col.tolist() for col in cols)):
+            if not self._replaying(strategy): break
+            # Update trades (simulate expiry for PREVIOUS trades): row is (time, o, h, l, c, v)
+            strategy.update_trades(row[4], row[0])
+            # Execute Strategy
+            strategy.next(make_candle(*row))
+
+    def _replay_context(self, strategy, history, wants_dict):
+        """Feed a reconnect's context candles through next() without trading (worker thread)."""
+        for h in history:
+            if not self._replaying(strategy): break
+            if 'timestamp' in h: h['time'] = h['timestamp']
+            if 'time' in h:
+                strategy.next(h if wants_dict else _Bar.from_history(h))
+
+    @staticmethod
+    def _feed_pump(feed, collector, ticks, loop, stop_evt):
+        # Worker thread: the generator is only ever touched (and closed) from here
+        put = ticks.put_nowait
+        try:
+            for raw_candle in collector:
+                loop.call_soon_threadsafe(put, raw_candle)
+                if stop_evt.is_set(): break
+        finally:
+            try:
+                feed.__exit__(None, None, None)
+            finally:
+                loop.call_soon_threadsafe(put, None) # End of feed
+
+    def _on_candle_timer(self):
+        self._candle_timer = None
+        self._last_emit_ns = time.monotonic_ns()
+        self._flush_pending_candle()
+
+    def _flush_pending_candle(self):
+        if self._candle_timer is not None:
+            self._candle_timer.cancel()
+            self._candle_timer = None
+        if self._pending_candle:
+            self._pending_candle = False
+            # Encoded here, at most once per emit window, rather than on every tick
+            payload = _CANDLE_HDR + orjson.dumps(self._candle_data, option=orjson.OPT_SERIALIZE_NUMPY) + b"}"
+            if payload != self._sent_candle: # Stale/duplicate ticks can leave the bar unchanged
+                self._sent_candle = payload
+                self._emit_raw(payload)
+
+    def _schedule(self, coro):
+        if threading.get_ident() == self._loop_thread_id:
+            # Engine code runs on the main loop now: plain task, no cross-thread Future
+            self._main_loop.create_task(coro)
+        else:
+            # Still used by helper threads (asset ranking)
+            asyncio.run_coroutine_threadsafe(coro, self._main_loop)
+
     def _emit_data(self, data):
-        asyncio.run_coroutine_threadsafe(self.callback(data), self.loop)
+        self._schedule(self.callback(data))
+
+    def _emit_raw(self, payload: bytes):
+        # Pre-encoded frame; falls back to the dict callback if no raw sender is wired
+        if self.raw_callback is not None:
+            self._schedule(self.raw_callback(payload))
+        else:
+            self._emit_data(orjson.loads(payload))
 
     def _emit_log(self, message, color="text-slate-300"):
-        log_entry = {
-            "type": "log",
-            "message": message,
-            "color": color
-        }
-        self.logs.append(log_entry)
-        self._emit_data(log_entry)
+        # Encoded once: the same frame goes to the websocket and into the resync ring
+        payload = b'{"type":"log","message":' + orjson.dumps(message) + b',"color":' + orjson.dumps(color) + b'}'
+        self._logs_json.append(payload)
+        self._logs_snapshot = None
+        if self._batch_logs:
+            self._pending_logs.append(payload)
+        else:
+            self._emit_raw(payload)
+
+    def _flush_logs(self):
+        # One frame for everything logged since the last candle close
+        pending = self._pending_logs
+        if not pending:
+            return
+        # popleft is atomic, so logs appended from helper threads meanwhile just wait for the next flush
+        entries = [pending.popleft() for _ in range(len(pending))]
+        if len(entries) == 1:
+            self._emit_raw(entries[0])
+        else:
+            self._emit_raw(b'{"type":"log_batch","entries":[' + b",".join(entries) + b"]}")
 
     @property
     def loop(self):
@@ -788,13 +1270,15 @@ class LiveEngine:
 # Helper to manage the single instance
 engine_instance = None
 
-def get_live_engine(callback, main_loop):
+def get_live_engine(callback, main_loop, raw_callback=None):
     global engine_instance
     if engine_instance is None:
-        engine_instance = LiveEngine(callback)
+        engine_instance = LiveEngine(callback, raw_callback)
         engine_instance._main_loop = main_loop
     # Update callback/loop if needed or just return
     # If connection drops and reconnects, we might update callback
     engine_instance.callback = callback
+    engine_instance.raw_callback = raw_callback
     engine_instance._main_loop = main_loop
+    engine_instance._loop_thread_id = threading.get_ident() # Called from a handler on main_loop
     return engine_instance
@@ -1,12 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.core.config import settings
 from app.api.endpoints import router as api_router
 
 # This file is kept only for reference or advanced usage.
 # The main entry point is now live_backtrader/main.py
 
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
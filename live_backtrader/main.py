@@ -1,18 +1,28 @@
 import uvicorn
 import os
 import json
+import orjson
 import asyncio
 from typing import List
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.core.config import settings
 # from app.api.endpoints import router as api_router
 from app.engine.live import get_live_engine
+from app.engine.backtester import start_backtest_pool, shutdown_backtest_pool
+
+# uvloop's C event loop makes every websocket send and engine emit cheaper; not available on Windows
+try:
+    import uvloop
+    EVENT_LOOP = "uvloop"
+except ImportError:
+    EVENT_LOOP = "asyncio"
 
 # Initialize App
-app = FastAPI(title=settings.PROJECT_NAME)
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -41,6 +51,15 @@ from app.api.endpoints import router as endpoints_router
 app.include_router(strategy_router, prefix="/api")
 app.include_router(endpoints_router, prefix="/api")
 
+# Backtest worker processes live exactly as long as the app (reloads don't leak them)
+@app.on_event("startup")
+async def start_workers():
+    start_backtest_pool()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    shutdown_backtest_pool()
+
 # --- WebSocket Manager ---
 class ConnectionManager:
     def __init__(self):
@@ -51,14 +70,25 @@ class ConnectionManager:
         self.active_connections.append(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        # May already be gone: a failed send drops the connection before its handler exits
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+
+    async def _send_all(self, text: str):
+        # Concurrent sends: one slow client no longer holds up the others (or the engine's emitter)
+        connections = list(self.active_connections)
+        results = await asyncio.gather(*(c.send_text(text) for c in connections), return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                pass
+        # Encode once for every connection
+        await self._send_all(orjson.dumps(message).decode())
+
+    async def broadcast_raw(self, payload: bytes):
+        # Frame already JSON-encoded by the engine; text frames since the page uses JSON.parse
+        await self._send_all(payload.decode())
 
 manager = ConnectionManager()
 
@@ -90,12 +120,16 @@ async def websocket_endpoint(websocket: WebSocket):
     
     # Get Main Loop for Threadsafe calling
     loop = asyncio.get_running_loop()
-    engine = get_live_engine(manager.broadcast, loop)
+    engine = get_live_engine(manager.broadcast, loop, manager.broadcast_raw)
 
     # Send current state on connect
-    state = engine.get_state()
-    if state['running']:
-        await websocket.send_text(json.dumps(state))
+    if engine.running:
+        # Log entries were encoded when logged; only the small header is serialized here
+        await websocket.send_text(engine.get_state_json().decode())
+        # Stats are only sent when they change, so a late joiner gets the current ones here
+        stats = engine.get_stats_json()
+        if stats is not None:
+            await websocket.send_text(stats.decode())
 
     try:
         while True:
@@ -129,5 +163,6 @@ async def websocket_endpoint(websocket: WebSocket):
 
 if __name__ == "__main__":
     print("🚀 Starting Unified Live Backtrader Platform...")
-    print(f"📡 Serving at http://localhost:8000")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    print(f"📡 Serving at http://localhost:8000 (event loop: {EVENT_LOOP})")
+    # Broadcast frames are small and identical across clients; per-connection deflate only burns CPU
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, ws_per_message_deflate=False, loop=EVENT_LOOP)
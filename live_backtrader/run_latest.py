@@ -2,6 +2,7 @@ import asyncio
 import websockets
 import json
 import logging
+from sqlalchemy import select
 from app.core.database import SessionLocal, Strategy
 
 # Configure logging
@@ -10,17 +11,14 @@ logger = logging.getLogger("TestRunner")
 
 async def run_latest_strategy():
     # 1. Fetch Latest Strategy from DB
-    db = SessionLocal()
-    try:
-        strategy = db.query(Strategy).order_by(Strategy.id.desc()).first()
+    async with SessionLocal() as db:
+        strategy = await db.scalar(select(Strategy).order_by(Strategy.id.desc()).limit(1))
         if not strategy:
             logger.error("No strategies found in database!")
             return
         
         logger.info(f"Loaded Strategy: {strategy.name} (ID: {strategy.id})")
         code = strategy.code
-    finally:
-        db.close()
 
     # 2. Connect to WebSocket
     uri = "ws://localhost:8000/ws/live"
@@ -0,0 +1,262 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.data import aggregation_kernel as kernel
+from app.data.aggregation_kernel import BAR_STALE, BAR_OPENED, BAR_UPDATED, BAR_CLOSED
+
+TF = 5
+
+
+def make_ticks(seed, n=600, tf=TF):
+    """Feed-shaped ticks with gaps, duplicate/late timestamps and ticks on bucket edges."""
+    rng = random.Random(seed)
+    ts = 1_700_000_000
+    price = 1.1
+    ticks = []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.08:
+            tick_ts = ts # Duplicate
+        elif r < 0.16:
+            tick_ts = ts - rng.randint(1, 3 * tf) # Late
+        else:
+            if r < 0.24:
+                ts += tf * rng.randint(2, 6) # Gap over empty buckets
+            elif r < 0.34:
+                ts = (ts // tf + 1) * tf # First second of the next bucket
+            elif r < 0.42:
+                ts = (ts // tf + 1) * tf + tf - 1 # Last second of the next bucket
+            else:
+                ts += rng.randint(1, 2)
+            tick_ts = ts
+        price += rng.uniform(-0.002, 0.002)
+        o = round(price + rng.uniform(-0.0005, 0.0005), 5)
+        c = round(price, 5)
+        h = round(max(o, c) + rng.uniform(0, 0.0005), 5)
+        l = round(min(o, c) - rng.uniform(0, 0.0005), 5)
+        vol = rng.choice([None, 0, 1, 3, 7])
+        ticks.append({'timestamp': tick_ts, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': vol})
+    return ticks
+
+
+def dict_aggregate(ticks, tf):
+    """The dict-based bar loop the live engine used before step_bar (reference)."""
+    events, closed = [], []
+    current = None
+    last_processed_ts = 0
+    for raw in ticks:
+        raw_ts = int(raw['timestamp'])
+        raw_vol = raw.get('volume') or 0
+        if raw_ts <= last_processed_ts:
+            events.append(BAR_STALE)
+            continue
+        last_processed_ts = raw_ts
+        start = (raw_ts // tf) * tf
+        fresh = {'time': start, 'open': raw['open'], 'high': raw['high'], 'low': raw['low'],
+                 'close': raw['close'], 'volume': raw_vol}
+        if current is None:
+            current = fresh
+            events.append(BAR_OPENED)
+        elif start != current['time']:
+            closed.append(current)
+            current = fresh
+            events.append(BAR_CLOSED)
+        else:
+            current['high'] = max(current['high'], raw['high'])
+            current['low'] = min(current['low'], raw['low'])
+            current['close'] = raw['close']
+            current['volume'] += raw_vol
+            events.append(BAR_UPDATED)
+    return events, [_bar(c) for c in closed], _bar(current)
+
+
+def _bar(c):
+    return (float(c['time']), float(c['open']), float(c['high']), float(c['low']), float(c['close']), float(c['volume']))
+
+
+def _row(tick):
+    return (float(tick['timestamp']), float(tick['open']), float(tick['high']), float(tick['low']),
+            float(tick['close']), float(tick['volume'] or 0))
+
+
+def run_step(step, state, closed_buf, ticks, tf):
+    events, closed = [], []
+    for tick in ticks:
+        status = step(state, closed_buf, *_row(tick), float(tf))
+        events.append(status)
+        if status == BAR_CLOSED:
+            closed.append(tuple(float(x) for x in closed_buf[:6]))
+    return events, closed, tuple(float(x) for x in state[:6])
+
+
+def summarize(events):
+    # What one fold_ticks call reports for a burst: the "strongest" event in it
+    if BAR_CLOSED in events:
+        return BAR_CLOSED
+    if BAR_OPENED in events:
+        return BAR_OPENED
+    if BAR_UPDATED in events:
+        return BAR_UPDATED
+    return BAR_STALE
+
+
+def columns(ticks):
+    rows = np.array([_row(t) for t in ticks], dtype=np.float64).reshape(-1, 6)
+    return tuple(np.ascontiguousarray(rows[:, i]) for i in range(6))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_step_bar_matches_dict_loop(seed):
+    ticks = make_ticks(seed)
+    expected = dict_aggregate(ticks, TF)
+
+    # Compiled kernel (the plain function again when numba is missing)
+    assert run_step(kernel.step_bar, np.zeros(9), np.zeros(6), ticks, TF) == expected
+    # Pure-Python fallback on list state, as used without numba
+    assert run_step(kernel._step_bar_py, [0.0] * 9, [0.0] * 6, ticks, TF) == expected
+
+
+def test_step_bar_rejects_duplicate_and_late_ticks():
+    state, closed = [0.0] * 9, [0.0] * 6
+    assert kernel._step_bar_py(state, closed, 100.0, 1, 1, 1, 1, 1, 5.0) == BAR_OPENED
+    assert kernel._step_bar_py(state, closed, 100.0, 2, 2, 2, 2, 1, 5.0) == BAR_STALE
+    assert kernel._step_bar_py(state, closed, 99.0, 2, 2, 2, 2, 1, 5.0) == BAR_STALE
+    # Last second of the bucket still updates, the first second of the next one closes it
+    assert kernel._step_bar_py(state, closed, 104.0, 3, 3, 0.5, 3, 1, 5.0) == BAR_UPDATED
+    assert kernel._step_bar_py(state, closed, 105.0, 4, 4, 4, 4, 1, 5.0) == BAR_CLOSED
+    assert closed == [100.0, 1, 3, 0.5, 3, 2]
+    assert state[kernel.BAR_TIME] == 105.0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fold_ticks_matches_dict_loop(seed, monkeypatch):
+    ticks = make_ticks(seed)
+    events, closed_ref, current_ref = dict_aggregate(ticks, TF)
+
+    # Random burst sizes, like catch-up drains of different backlogs
+    rng = random.Random(seed)
+    cuts, i = [], 0
+    while i < len(ticks):
+        j = min(len(ticks), i + rng.randint(1, 80))
+        cuts.append((i, j))
+        i = j
+
+    state = np.zeros(9)
+    closed = []
+    for i, j in cuts:
+        rows = np.empty((j - i, 6))
+        k, status = kernel.fold_ticks(state, rows, *columns(ticks[i:j]), float(TF))
+        assert status == summarize(events[i:j])
+        closed.extend(tuple(float(x) for x in row) for row in rows[:k])
+    assert closed == closed_ref
+    assert tuple(float(x) for x in state[:6]) == current_ref
+
+    # Pure-Python fallback: list state, plain-float columns, Python step_bar
+    monkeypatch.setattr(kernel, "step_bar", kernel._step_bar_py)
+    state = [0.0] * 9
+    closed = []
+    for i, j in cuts:
+        rows = [[0.0] * 6 for _ in range(j - i)]
+        k, status = kernel._fold_ticks_py(state, rows, *(col.tolist() for col in columns(ticks[i:j])), float(TF))
+        assert status == summarize(events[i:j])
+        closed.extend(tuple(row) for row in rows[:k])
+    assert closed == closed_ref
+    assert tuple(state[:6]) == current_ref
+
+
+def dict_candles(ts, px, period):
+    """The dict-based CandleAggregator.process_tick loop (reference): tick volume starts at 0."""
+    candles = []
+    current = None
+    for t, p in zip(ts.tolist(), px.tolist()):
+        candle_time = (t // period) * period
+        if current and current['time'] != candle_time:
+            candles.append(current)
+            current = None
+        if not current:
+            current = {'time': candle_time, 'open': p, 'high': p, 'low': p, 'close': p, 'volume': 0}
+        else:
+            current['high'] = max(current['high'], p)
+            current['low'] = min(current['low'], p)
+            current['close'] = p
+            current['volume'] += 1
+    candles.append(current)
+    return candles
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("period", [1, 5, 60])
+def test_aggregate_ohlcv_matches_dict_aggregator(seed, period):
+    # Batch input is time-ordered; duplicates stay (same bucket), late ticks are sorted in
+    ticks = sorted(make_ticks(seed), key=lambda t: t['timestamp'])
+    ts = np.array([t['timestamp'] for t in ticks], dtype=np.int64)
+    px = np.array([t['close'] for t in ticks], dtype=np.float64)
+    expected = [(c['time'], c['open'], c['high'], c['low'], c['close'], c['volume'] + 1)
+                for c in dict_candles(ts, px, period)]
+
+    for aggregate in (kernel.aggregate_ohlcv, kernel._aggregate_ohlcv_numpy):
+        times, ohlc, counts = aggregate(ts, px, period)
+        got = [(t, *row, n) for t, row, n in zip(times.tolist(), ohlc.tolist(), counts.tolist())]
+        assert got == expected
+
+
+def reference_trades(times, signals, expiry):
+    trades = []
+    open_trade = None
+    for i, (t, s) in enumerate(zip(times, signals)):
+        if open_trade is not None and t >= open_trade[3]:
+            open_trade[1] = i
+            open_trade = None
+        if open_trade is None and s != 0:
+            open_trade = [i, -1, 1 if s > 0 else -1, t + expiry]
+            trades.append(open_trade)
+    return [tuple(tr[:3]) for tr in trades]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("expiry", [5, 12, 60])
+def test_signal_trades_matches_reference(seed, expiry):
+    rng = random.Random(seed)
+    times, t = [], 1_700_000_000
+    for _ in range(400):
+        t += rng.choice([5, 5, 5, 10, 30]) # Candle times with gaps
+        times.append(t)
+    times = np.array(times, dtype=np.int64)
+    signals = np.array([rng.choice([-1, 0, 0, 0, 1]) for _ in range(times.size)], dtype=np.int8)
+    expected = reference_trades(times.tolist(), signals.tolist(), expiry)
+
+    for trades in (kernel.signal_trades, kernel._signal_trades_py):
+        entries, exits, dirs = trades(times, signals, expiry)
+        assert list(zip(entries.tolist(), exits.tolist(), dirs.tolist())) == expected
+
+
+def test_signal_trades_exits_on_the_expiry_boundary():
+    times = np.array([0, 5, 10, 15], dtype=np.int64)
+    signals = np.array([1, -1, 0, -1], dtype=np.int8)
+    entries, exits, dirs = kernel._signal_trades_py(times, signals, 10)
+    # Placed at t=0, expires at the first candle with time >= 10; t=5's signal is skipped
+    assert entries.tolist() == [0, 3]
+    assert exits.tolist() == [2, -1]
+    assert dirs.tolist() == [1, -1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_robust_price_mask_matches_per_bucket_median(seed):
+    rng = np.random.default_rng(seed)
+    ts = np.sort(1_700_000_000 + rng.integers(0, 600, size=500))
+    px = 1.1 * np.exp(rng.normal(0, 0.001, size=ts.size))
+    px[rng.integers(0, ts.size, size=15)] *= rng.choice([0.5, 2.0], size=15) # Outliers
+    period, r = 5, 1.01
+
+    x = np.log(px)
+    buckets = (ts // period) * period
+    expected = np.empty(ts.size, dtype=bool)
+    for b in np.unique(buckets):
+        sel = buckets == b
+        expected[sel] = np.abs(x[sel] - np.median(x[sel])) <= np.log(r)
+
+    mask = kernel.robust_price_mask(ts, px, period, r)
+    assert mask.tolist() == expected.tolist()
+    assert not mask.all()
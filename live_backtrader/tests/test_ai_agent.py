@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from app.engine.ai_agent import AITradingAgent
+
+
+def loop_loss_streak(trades):
+    # Plain counter loop (reference)
+    best = current = 0
+    for t in trades:
+        if (t.get('pnl', t.get('profit', 0)) or 0) < 0:
+            current += 1
+            best = max(best, current)
+        else:
+            current = 0
+    return best
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_max_loss_streak_matches_loop(seed):
+    rng = random.Random(seed)
+    trades = []
+    for _ in range(rng.randint(1, 200)):
+        value = rng.choice([-5.0, -1.0, 0.0, 2.5, None])
+        trades.append({rng.choice(['pnl', 'profit']): value})
+    assert AITradingAgent.max_loss_streak(trades) == loop_loss_streak(trades)
+
+
+@pytest.mark.parametrize("pnls, expected", [
+    ([], 0),
+    ([1], 0),
+    ([-1], 1),
+    ([-1, -1, -1], 3),
+    ([-1, 2, -1, -1], 2),
+    ([-1, -1, 0, -1], 2), # A draw breaks the streak
+    ([3, -1, -1, -1, 4], 3),
+])
+def test_max_loss_streak_edges(pnls, expected):
+    assert AITradingAgent.max_loss_streak([{'pnl': p} for p in pnls]) == expected
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("BinaryOptionsToolsV2")
+
+from app.data.pocketoption_history import PocketOptionHistory
+
+
+class FakeApi:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+
+    async def get_candles(self, asset, period, time_back):
+        self.calls.append((asset, period, time_back))
+        await asyncio.sleep(self.delay)
+        return [{'time': 1_700_000_000 + i * period, 'open': 1.0, 'high': 1.2, 'low': 0.9, 'close': 1.1}
+                for i in range(5)]
+
+    async def disconnect(self):
+        pass
+
+
+def test_concurrent_identical_fetches_share_one_call():
+    async def main():
+        history = PocketOptionHistory("ssid")
+        history.api = api = FakeApi()
+
+        a, b, c = await asyncio.gather(*(history.fetch_candles("EURUSD_otc", 60, 5) for _ in range(3)))
+        assert api.calls == [("EURUSD_otc", 60, 300)]
+        assert a == b == c and len(a) == 5
+
+        # Each caller owns its list and its candles
+        assert a is not b and a[0] is not b[0]
+        a.pop()
+        a[0]['close'] = 99.0
+        assert len(b) == 5 and b[0]['close'] == 1.1
+
+        await history.close()
+        assert history._worker is None
+
+    asyncio.run(main())
+
+
+def test_different_requests_in_one_batch_are_fetched_separately():
+    async def main():
+        history = PocketOptionHistory("ssid")
+        history.api = api = FakeApi()
+
+        await asyncio.gather(history.fetch_candles("EURUSD_otc", 60, 5), history.fetch_candles("EURUSD_otc", 5, 5),
+                             history.fetch_candles("GBPUSD_otc", 60, 5))
+        assert sorted(api.calls) == [("EURUSD_otc", 5, 25), ("EURUSD_otc", 60, 300), ("GBPUSD_otc", 60, 300)]
+        await history.close()
+
+    asyncio.run(main())
+
+
+def test_close_cancels_worker_and_waiting_callers():
+    async def main():
+        history = PocketOptionHistory("ssid")
+        history.api = FakeApi(delay=10)
+
+        waiting = asyncio.create_task(history.fetch_candles("EURUSD_otc", 60, 5))
+        await asyncio.sleep(0.05) # Batch is in flight
+        worker = history._worker
+
+        await asyncio.wait_for(history.close(), 1)
+        assert worker.cancelled()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(main())